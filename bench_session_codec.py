@@ -0,0 +1,165 @@
+"""
+Benchmark of session storage formats on realistic 50-turn sessions.
+
+Each turn is a user message, a retrieve_legal_info call, its response (10
+chunks of Act text, up to 2000 characters each) and the model's answer.
+Compares the legacy full-JSON rewrite against the snapshot + log format with
+each codec: bytes on disk, bytes written over the session, and save / load
+latency.
+
+    python bench_session_codec.py [--turns 50] [--sessions 5]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+
+from google.adk.events import Event
+from google.adk.sessions.session import Session
+from google.genai import types
+
+from legal_agent.persistence import FileSessionService
+from legal_agent.session_codec import SessionCodec, orjson, zstandard
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "legal_agent", "data")
+
+
+def load_corpus(max_pages: int = 60) -> list:
+    """Act text to fill tool responses with (synthetic if the PDFs are not available)."""
+    try:
+        from legal_agent.index.pdf_pipeline import iter_page_texts
+
+        pages = []
+        for file in sorted(os.listdir(DATA_DIR)):
+            if file.endswith(".pdf"):
+                pages.extend(iter_page_texts(os.path.join(DATA_DIR, file), 0, max_pages // 4))
+        if pages:
+            return pages
+    except Exception as e:
+        print(f"Using synthetic text ({e})")
+    words = "the authority shall within a period of thirty days grant registration consumer complaint " \
+            "section appeal commission information officer promoter allottee penalty offence".split()
+    rng = random.Random(0)
+    return [" ".join(rng.choice(words) for _ in range(400)) for _ in range(max_pages)]
+
+
+def make_turn(rng: random.Random, corpus: list, turn: int) -> list:
+    question = f"Turn {turn}: what does the Act say about " + " ".join(rng.choice(corpus)[:200].split()[:12])
+    results = [
+        {"text": rng.choice(corpus)[:2000], "source": "act.pdf", "score": round(rng.random(), 2)}
+        for _ in range(10)
+    ]
+    call = types.FunctionCall(id=f"call-{turn}", name="retrieve_legal_info", args={"query": question})
+    response = types.FunctionResponse(id=f"call-{turn}", name="retrieve_legal_info", response={"results": results})
+    return [
+        Event(author="user", invocation_id=f"inv-{turn}",
+              content=types.Content(role="user", parts=[types.Part(text=question)])),
+        Event(author="legal_agent", invocation_id=f"inv-{turn}",
+              content=types.Content(role="model", parts=[types.Part(function_call=call)])),
+        Event(author="legal_agent", invocation_id=f"inv-{turn}",
+              content=types.Content(role="user", parts=[types.Part(function_response=response)])),
+        Event(author="legal_agent", invocation_id=f"inv-{turn}",
+              content=types.Content(role="model", parts=[types.Part(text=rng.choice(corpus)[:1500])])),
+    ]
+
+
+def dir_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path))
+
+
+def bench_legacy(sessions: list, turns: list, path: str) -> dict:
+    """What FileSessionService did before: rewrite <id>.json after every turn."""
+    save_times, written = [], 0
+    for session, session_turns in zip(sessions, turns):
+        file_path = os.path.join(path, f"{session.id}.json")
+        for events in session_turns:
+            session.events.extend(events)
+            started = time.perf_counter()
+            data = session.model_dump_json()
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            save_times.append(time.perf_counter() - started)
+            written += len(data.encode("utf-8"))
+    load_times = []
+    for session in sessions:
+        started = time.perf_counter()
+        with open(os.path.join(path, f"{session.id}.json"), encoding="utf-8") as f:
+            Session.model_validate_json(f.read())
+        load_times.append(time.perf_counter() - started)
+    return {"disk": dir_size(path), "written": written, "save": save_times, "load": load_times, "tail": load_times}
+
+
+def bench_log(sessions: list, turns: list, path: str, codec: SessionCodec) -> dict:
+    service = FileSessionService(path, flush_interval=0, codec=codec)
+    save_times, written = [], 0
+    for session, session_turns in zip(sessions, turns):
+        service.cache.put(session.id, session)
+        service._needs_snapshot.add(session.id)
+        for events in session_turns:
+            session.events.extend(events)
+            before = dir_size(path)
+            compactions = service.compactions
+            started = time.perf_counter()
+            service._write(session.id)
+            save_times.append(time.perf_counter() - started)
+            after = dir_size(path)
+            # A compaction rewrites the snapshot; otherwise only the log grew
+            written += after if service.compactions != compactions else after - before
+    load_times, tail_times = [], []
+    for session in sessions:
+        fresh = FileSessionService(path, codec=codec)
+        started = time.perf_counter()
+        fresh._load(session.id)
+        load_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        fresh._load(session.id, tail=8)
+        tail_times.append(time.perf_counter() - started)
+    return {"disk": dir_size(path), "written": written, "save": save_times, "load": load_times, "tail": tail_times}
+
+
+def new_sessions(count: int) -> list:
+    return [Session(id=f"bench-{i}", app_name="legal_agent", user_id="bench", events=[]) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    rng = random.Random(42)
+    turns = [[make_turn(rng, corpus, t) for t in range(args.turns)] for _ in range(args.sessions)]
+    print(f"{args.sessions} sessions x {args.turns} turns ({4 * args.turns} events each); "
+          f"orjson {'on' if orjson else 'off'}, zstandard {'on' if zstandard else 'off'}\n")
+
+    variants = [("legacy json", None), ("log, none", SessionCodec("none")), ("log, gzip", SessionCodec("gzip"))]
+    if zstandard is not None:
+        variants.append(("log, zstd", SessionCodec("zstd")))
+
+    def ms(values):
+        return f"{statistics.mean(values) * 1000:8.2f}"
+
+    print(f"{'format':<12} {'disk KB':>9} {'written KB':>11} {'save ms':>8} {'load ms':>8} {'tail ms':>8}")
+    for name, codec in variants:
+        path = tempfile.mkdtemp(prefix="bench-sessions-")
+        try:
+            # Events are re-created per variant so no variant reuses another's cached serialization
+            fresh_turns = [[[event.model_copy(deep=True) for event in t] for t in s] for s in turns]
+            if codec is None:
+                result = bench_legacy(new_sessions(args.sessions), fresh_turns, path)
+            else:
+                result = bench_log(new_sessions(args.sessions), fresh_turns, path, codec)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+        print(f"{name:<12} {result['disk'] / 1024:9.0f} {result['written'] / 1024:11.0f} "
+              f"{ms(result['save'])} {ms(result['load'])} {ms(result['tail'])}")
+    print("\nsave = mean per turn, load = full session, tail = last 8 events (legacy has to load everything)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
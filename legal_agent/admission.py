@@ -0,0 +1,155 @@
+import os
+import math
+import time
+import asyncio
+from typing import Dict, Optional
+
+# Chat turns running at once across the server, and turns allowed to wait for a slot
+CHAT_MAX_CONCURRENT = int(os.getenv("CHAT_MAX_CONCURRENT", "8"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "32"))
+# Longest a turn waits (for its session, then for a slot) before it is shed
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "30"))
+# Turns allowed to queue up behind each other on one session
+CHAT_SESSION_QUEUE = int(os.getenv("CHAT_SESSION_QUEUE", "4"))
+
+
+class Overloaded(Exception):
+    """A turn was shed: 429 when a queue is full, 503 when the wait timed out."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """Held for the duration of one admitted turn; `release()` is idempotent."""
+
+    def __init__(self, controller: "AdmissionController", session_id: str):
+        self._controller = controller
+        self.session_id = session_id
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+
+class AdmissionController:
+    """
+    Admission control for chat turns.
+
+    Turns on one session run one at a time, in arrival order (an asyncio.Lock
+    per session, dropped once nobody holds or waits for it), so concurrent
+    requests never mutate the same cached Session. Across sessions at most
+    `max_active` turns run at once; up to `max_queue` more wait for a slot.
+    Anything beyond that is rejected right away, and a turn that waits longer
+    than `queue_timeout` gives up, with a Retry-After estimated from recent
+    turn durations, instead of piling up until clients time out.
+    """
+
+    def __init__(self, max_active: int = CHAT_MAX_CONCURRENT, max_queue: int = CHAT_MAX_QUEUE,
+                 queue_timeout: float = CHAT_QUEUE_TIMEOUT, max_per_session: int = CHAT_SESSION_QUEUE):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_per_session = max_per_session
+        self._slots: Optional[asyncio.Semaphore] = None
+        # session_id -> [lock, turns holding or waiting for it]
+        self._sessions: Dict[str, list] = {}
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        # Moving average of turn duration, for Retry-After
+        self.turn_seconds = 10.0
+
+    def retry_after(self) -> int:
+        backlog = (self.waiting + 1) / max(self.max_active, 1)
+        return max(1, math.ceil(self.turn_seconds * backlog))
+
+    def _shed(self, status_code: int, detail: str) -> Overloaded:
+        if status_code == 429:
+            self.rejected += 1
+        else:
+            self.timed_out += 1
+        return Overloaded(status_code, detail, self.retry_after())
+
+    async def acquire(self, session_id: str) -> Ticket:
+        """Waits for the session and a global slot; raises Overloaded if the turn is shed."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_active)
+        deadline = time.monotonic() + self.queue_timeout
+        entry = self._sessions.setdefault(session_id, [asyncio.Lock(), 0])
+        if entry[1] >= self.max_per_session:
+            raise self._shed(429, "Too many messages pending for this session.")
+        # Checked and counted before the first await, so a burst cannot overshoot the queue
+        if self.active + self.waiting >= self.max_active + self.max_queue:
+            if entry[1] == 0:
+                self._sessions.pop(session_id, None)
+            raise self._shed(429, "The server is busy, please try again shortly.")
+        entry[1] += 1
+        self.waiting += 1
+        session_locked = False
+        try:
+            # 1. This session's earlier turns first
+            try:
+                await asyncio.wait_for(entry[0].acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._shed(503, "An earlier message in this session is still being answered.")
+            session_locked = True
+            # 2. A global slot
+            try:
+                await asyncio.wait_for(self._slots.acquire(), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                raise self._shed(503, "The server is busy, please try again shortly.")
+        except BaseException:
+            if session_locked:
+                entry[0].release()
+            self._leave(session_id, entry)
+            raise
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        return Ticket(self, session_id)
+
+    def _leave(self, session_id: str, entry: list) -> None:
+        entry[1] -= 1
+        if entry[1] == 0:
+            self._sessions.pop(session_id, None)
+
+    def _release(self, ticket: Ticket) -> None:
+        self.active -= 1
+        self.turn_seconds = 0.8 * self.turn_seconds + 0.2 * (time.monotonic() - ticket.started)
+        self._slots.release()
+        entry = self._sessions[ticket.session_id]
+        entry[0].release()
+        self._leave(ticket.session_id, entry)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_active": self.max_active,
+            "max_queue": self.max_queue,
+            "sessions": len(self._sessions),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_turn_seconds": round(self.turn_seconds, 2),
+        }
+
+
+_admission = None
+
+
+def get_admission() -> AdmissionController:
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController()
+    return _admission
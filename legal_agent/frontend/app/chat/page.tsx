@@ -13,7 +13,7 @@ import { Button } from "@/components/ui/button"
 
 import { ArrowUp, Loader2, Menu } from "lucide-react"
 
-import { createSession, sendChatMessage } from "@/lib/api"
+import { createSession, streamChatMessage } from "@/lib/api"
 import { MessageBubble } from "@/components/MessageBubble"
 
 /* ---------------- Mobile Sidebar Toggle ---------------- */
@@ -125,19 +125,50 @@ export default function ChatPage() {
       },
     ])
 
-    try {
-      const res = await sendChatMessage({
-        message: userText,
-        sessionId,
-        userId: "default_user",
-      })
+    // The answer is shown as it streams in, instead of typed out after the whole turn
+    const aiMessageId = crypto.randomUUID()
+    let started = false
+    const showAIText = (update: (text: string) => string) => {
+      if (!started) {
+        started = true
+        setLoading(false)
+        setMessages((prev) => [...prev, { id: aiMessageId, role: "ai", text: "" }])
+      }
+      setMessages((prev) =>
+        prev.map((msg) =>
+          msg.id === aiMessageId ? { ...msg, text: update(msg.text) } : msg
+        )
+      )
+    }
 
+    try {
+      await streamChatMessage(
+        {
+          message: userText,
+          sessionId,
+          userId: "default_user",
+        },
+        (event) => {
+          if (event.type === "text" && event.text) {
+            const chunk = event.text
+            showAIText((text) => text + chunk)
+          } else if (event.type === "done" && !started) {
+            typeAIResponse(event.response || "No response from LegalAI.")
+            started = true
+          } else if (event.type === "error") {
+            throw new Error(event.detail)
+          }
+        },
+      )
       setLoading(false)
-      typeAIResponse(res.response || "No response from LegalAI.")
     } catch (err) {
       console.error(err)
       setLoading(false)
-      typeAIResponse("Something went wrong. Please try again.")
+      if (started) {
+        showAIText((text) => text + "\n\nSomething went wrong. Please try again.")
+      } else {
+        typeAIResponse("Something went wrong. Please try again.")
+      }
     }
   }
 
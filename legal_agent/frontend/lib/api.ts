@@ -45,3 +45,69 @@ export async function sendChatMessage({
 
   return res.json()
 }
+
+
+//  Stream a chat turn (Server-Sent Events): onEvent gets "session", "text",
+//  "tool_start", "tool_end", "file" and finally "done" or "error" as they arrive
+export type ChatStreamEvent = {
+  type: string
+  text?: string
+  name?: string
+  filename?: string
+  url?: string
+  response?: string
+  session_id?: string
+  detail?: string
+}
+
+export async function streamChatMessage(
+  {
+    message,
+    sessionId,
+  }: {
+    message: string
+    sessionId: string
+    userId?: string
+  },
+  onEvent: (event: ChatStreamEvent) => void,
+  signal?: AbortSignal,
+) {
+  const res = await fetch(`http://localhost:8002/chat/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      message,
+      session_id: sessionId,
+      user_id: "default_user",
+    }),
+    signal,
+  })
+
+  if (!res.ok || !res.body) {
+    throw new Error("Chat request failed")
+  }
+
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ""
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    // Events are separated by a blank line; the last chunk may be incomplete
+    const blocks = buffer.split("\n\n")
+    buffer = blocks.pop() ?? ""
+    for (const block of blocks) {
+      const data = block
+        .split("\n")
+        .filter((line) => line.startsWith("data:"))
+        .map((line) => line.slice("data:".length).trim())
+        .join("\n")
+      if (data) onEvent(JSON.parse(data))
+    }
+  }
+}
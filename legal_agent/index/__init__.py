@@ -0,0 +1,3 @@
+from .backends import get_backend
+
+__all__ = ["get_backend"]
@@ -0,0 +1,300 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Iterator, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from legal_agent.tools.weaviate_pool import connect, get_pool, get_async_manager
+from legal_agent.tools.semantic_cache import INDEX_DATA_DIR, read_index_generation
+from .local_store import LocalIndexWriter, LocalVectorIndex
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Queries always go through this name. Since incremental ingestion it is an alias
+# pointing at a versioned collection (LegalDocs_<timestamp>) that is swapped on rebuild.
+COLLECTION_NAME = "LegalDocs"
+# Tries at creating the alias once the legacy collection is gone (1, 2, 4, ... seconds apart)
+ALIAS_CREATE_ATTEMPTS = 5
+
+
+def _hits_from_objects(objects) -> List[dict]:
+    return [{**obj.properties, "distance": obj.metadata.distance} for obj in objects]
+
+
+def _resolve_collection(client) -> Optional[str]:
+    """Name of the collection currently served as LegalDocs, or None."""
+    alias = client.alias.get(alias_name=COLLECTION_NAME)
+    if alias is not None:
+        return alias.collection
+    if client.collections.exists(COLLECTION_NAME):
+        return COLLECTION_NAME  # Pre-alias deployments
+    return None
+
+
+def _default_vector(vector):
+    if isinstance(vector, dict):
+        return vector.get("default") or next(iter(vector.values()))
+    return vector
+
+
+class WeaviateBackend:
+    """LegalDocs collection on Weaviate Cloud (the default backend)."""
+
+    name = "weaviate"
+
+    def search(self, vector: List[float], limit: int = 10) -> List[dict]:
+        def _search(client):
+            collection = client.collections.get(COLLECTION_NAME)
+            return collection.query.near_vector(
+                near_vector=vector,
+                limit=limit,
+                return_metadata=["distance"]
+            )
+        return _hits_from_objects(get_pool().run(_search).objects)
+
+    async def asearch(self, vector: List[float], limit: int = 10) -> List[dict]:
+        manager = get_async_manager()
+        if not manager.is_bound():
+            # Called from a private loop (e.g. the sync ADK runner thread): an async
+            # client would not outlive that loop, so use the pooled sync clients.
+            return await asyncio.to_thread(self.search, vector, limit)
+
+        async def _search(client):
+            collection = client.collections.get(COLLECTION_NAME)
+            return await collection.query.near_vector(
+                near_vector=vector,
+                limit=limit,
+                return_metadata=["distance"]
+            )
+        return _hits_from_objects((await manager.run(_search)).objects)
+
+    def count(self) -> int:
+        with get_pool().client() as client:
+            name = _resolve_collection(client)
+            if name is None:
+                return 0
+            collection = client.collections.get(name)
+            return collection.aggregate.over_all(total_count=True).total_count
+
+    def iter_chunks(self, sources: Set[str]) -> Iterator[Tuple[dict, List[float]]]:
+        """Yields (record, vector) for served chunks whose source is in `sources`."""
+        if not sources:
+            return
+        with get_pool().client() as client:
+            name = _resolve_collection(client)
+            if name is None:
+                return
+            for obj in client.collections.get(name).iterator(include_vector=True):
+                if obj.properties.get("source") in sources:
+                    yield dict(obj.properties), _default_vector(obj.vector)
+
+    def writer(self) -> "WeaviateWriter":
+        return WeaviateWriter()
+
+
+class WeaviateWriter:
+    """
+    Uploads chunks into a fresh versioned collection. `commit()` then points the
+    LegalDocs alias at it and drops the previous version, so queries switch
+    from the old index to the new one without ever seeing a partial or empty one.
+    """
+
+    def __init__(self):
+        import weaviate.classes.config as wc
+
+        self._client = connect()
+        self.target = f"{COLLECTION_NAME}_{time.time_ns()}"
+        try:
+            self._client.collections.create(
+                name=self.target,
+                properties=[
+                    wc.Property(name="text", data_type=wc.DataType.TEXT),
+                    wc.Property(name="source", data_type=wc.DataType.TEXT),
+                    # Statute structure (see statute.py); None outside sections
+                    wc.Property(name="act", data_type=wc.DataType.TEXT),
+                    wc.Property(name="chapter", data_type=wc.DataType.TEXT),
+                    wc.Property(name="section", data_type=wc.DataType.TEXT),
+                    wc.Property(name="heading", data_type=wc.DataType.TEXT),
+                ],
+                vectorizer_config=wc.Configure.Vectorizer.none() # Own vectors
+            )
+            self._collection = self._client.collections.get(self.target)
+            self._batch_ctx = self._collection.batch.dynamic()
+            self._batch = self._batch_ctx.__enter__()
+        except Exception:
+            self._client.close()
+            raise
+        self.count = 0
+        # Set once commit() has run (whether it succeeded or not); abort() is a no-op after that
+        self._done = False
+
+    def add(self, vector: List[float], record: dict, chunk_id: Optional[str] = None) -> None:
+        from weaviate.util import generate_uuid5
+
+        uuid = generate_uuid5(f"{record.get('source')}:{chunk_id}") if chunk_id else None
+        properties = {k: v for k, v in record.items() if v is not None}
+        self._batch.add_object(properties=properties, vector=vector, uuid=uuid)
+        self.count += 1
+
+    def commit(self, info: dict = None) -> None:
+        client = self._client
+        self._done = True
+        try:
+            try:
+                self._batch_ctx.__exit__(None, None, None)
+                failed = self._collection.batch.failed_objects
+                if failed:
+                    raise RuntimeError(f"{len(failed)} objects failed to upload, first error: {failed[0].message}")
+
+                previous = _resolve_collection(client)
+                legacy = previous == COLLECTION_NAME
+                if legacy:
+                    pass  # Replaced below; until then the new collection is still disposable
+                elif client.alias.get(alias_name=COLLECTION_NAME) is not None:
+                    client.alias.update(alias_name=COLLECTION_NAME, new_target_collection=self.target)
+                else:
+                    client.alias.create(alias_name=COLLECTION_NAME, target_collection=self.target)
+            except Exception:
+                # The alias was not moved, so the new collection is not served: drop it
+                self._delete_target()
+                raise
+            if legacy:
+                self._replace_legacy_collection()
+                previous = None
+            logger.info(f"{COLLECTION_NAME} now serves {self.target} ({self.count} chunks).")
+            if previous:
+                try:
+                    client.collections.delete(previous)
+                except Exception as e:
+                    logger.warning(f"Could not delete the previous collection {previous}: {e}")
+        finally:
+            client.close()
+
+    def _replace_legacy_collection(self) -> None:
+        """
+        One-time migration from a pre-alias deployment. Not atomic: an alias
+        cannot shadow a real collection, so the legacy LegalDocs collection has
+        to go before the alias is created, and queries find nothing in between.
+        Once it is gone the new collection is the only copy of the corpus, so it
+        is kept whatever happens.
+        """
+        client = self._client
+        logger.warning(f"Replacing the legacy {COLLECTION_NAME} collection with an alias to {self.target}; "
+                       f"queries find nothing until the alias exists.")
+        client.collections.delete(COLLECTION_NAME)
+        for attempt in range(ALIAS_CREATE_ATTEMPTS):
+            try:
+                client.alias.create(alias_name=COLLECTION_NAME, target_collection=self.target)
+                return
+            except Exception as e:
+                if attempt + 1 == ALIAS_CREATE_ATTEMPTS:
+                    logger.critical(
+                        f"The legacy {COLLECTION_NAME} collection was deleted but the alias to {self.target} "
+                        f"could not be created ({e}). Nothing is served until the alias {COLLECTION_NAME} -> "
+                        f"{self.target} is created by hand."
+                    )
+                    raise
+                logger.error(f"Creating the alias {COLLECTION_NAME} -> {self.target} failed ({e}), retrying.")
+                time.sleep(2 ** attempt)
+
+    def abort(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        try:
+            try:
+                self._batch_ctx.__exit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"Flushing the aborted upload failed: {e}")
+            self._delete_target()
+        finally:
+            self._client.close()
+
+    def _delete_target(self) -> None:
+        # Best effort: a failure here must not replace the error that caused the cleanup
+        try:
+            self._client.collections.delete(self.target)
+        except Exception as e:
+            logger.warning(f"Could not delete the unused collection {self.target}: {e}")
+
+
+class LocalBackend:
+    """
+    Embedded index on local disk (see local_store.py): no network hop per
+    query, and usable offline. The memory map is reopened whenever ingestion
+    bumps the index generation.
+    """
+
+    name = "local"
+
+    def __init__(self, index_dir: str, ivf_lists: int = 0, nprobe: int = 8):
+        self.index_dir = index_dir
+        self.ivf_lists = ivf_lists
+        self.nprobe = nprobe
+        self._index = None
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def _get_index(self):
+        generation = read_index_generation()
+        if self._index is None or generation != self._generation:
+            with self._lock:
+                if self._index is None or generation != self._generation:
+                    if not LocalVectorIndex.exists(self.index_dir):
+                        return None
+                    self._index = LocalVectorIndex(self.index_dir, nprobe=self.nprobe)
+                    self._generation = generation
+                    logger.info(f"Opened local index at {self.index_dir} ({self._index.count} chunks).")
+        return self._index
+
+    def search(self, vector: List[float], limit: int = 10) -> List[dict]:
+        index = self._get_index()
+        return index.search(vector, limit) if index else []
+
+    async def asearch(self, vector: List[float], limit: int = 10) -> List[dict]:
+        # Sub-millisecond and in-process: no need to leave the event loop
+        return self.search(vector, limit)
+
+    def count(self) -> int:
+        index = self._get_index()
+        return index.count if index else 0
+
+    def iter_chunks(self, sources: Set[str]) -> Iterator[Tuple[dict, List[float]]]:
+        """Yields (record, vector) for indexed chunks whose source is in `sources`."""
+        index = self._get_index()
+        if not index or not sources:
+            return
+        for row in range(index.count):
+            record = index.record(row)
+            if record.get("source") in sources:
+                yield record, index.vectors[row]
+
+    def writer(self) -> LocalIndexWriter:
+        return LocalIndexWriter(self.index_dir, ivf_lists=self.ivf_lists)
+
+
+# Global backend (Lazy loaded)
+_backend = None
+
+
+def get_backend():
+    """Returns the backend selected by RETRIEVAL_BACKEND ("weaviate" or "local")."""
+    global _backend
+    if _backend is None:
+        kind = os.getenv("RETRIEVAL_BACKEND", "weaviate").lower()
+        if kind == "local":
+            _backend = LocalBackend(
+                index_dir=os.getenv("LOCAL_INDEX_DIR", os.path.join(INDEX_DATA_DIR, "local")),
+                ivf_lists=int(os.getenv("LOCAL_INDEX_IVF_LISTS", "0")),
+                nprobe=int(os.getenv("LOCAL_INDEX_NPROBE", "8")),
+            )
+        elif kind == "weaviate":
+            _backend = WeaviateBackend()
+        else:
+            raise ValueError(f"Unknown RETRIEVAL_BACKEND '{kind}' (expected 'weaviate' or 'local').")
+    return _backend
@@ -0,0 +1,142 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from legal_agent.tools.semantic_cache import INDEX_DATA_DIR
+from .local_store import swap_directory
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", os.path.join(INDEX_DATA_DIR, "embeddings"))
+
+# File layout of one model's store directory
+VECTORS_FILE = "vectors.f32"  # (rows, dim) float32, append-only
+KEYS_FILE = "keys.bin"        # (rows, 32) raw sha256 digests, parallel to VECTORS_FILE
+INFO_FILE = "info.json"
+KEY_SIZE = 32
+
+
+class EmbeddingStore:
+    """
+    Append-only on-disk store of chunk embeddings for one model, keyed by the
+    sha256 of the chunk text.
+
+    Vectors are packed back to back in one float32 file, so a bulk lookup is a
+    single fancy-indexed read from a memory map. Rows are appended vectors
+    first, then keys, and a torn tail is ignored on open, so a crash mid-append
+    loses at most that append.
+    """
+
+    def __init__(self, model: str, root: str = EMBEDDING_STORE_DIR):
+        self.model = model
+        self.path = os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]", "_", model))
+        os.makedirs(self.path, exist_ok=True)
+        self.dim = None
+        info_path = os.path.join(self.path, INFO_FILE)
+        if os.path.exists(info_path):
+            with open(info_path, encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        self._rows: Dict[bytes, int] = {}
+        self.count = 0
+        self._load_keys()
+        self.hits = 0
+        self.misses = 0
+
+    def _load_keys(self) -> None:
+        keys_path = os.path.join(self.path, KEYS_FILE)
+        if self.dim is None or not os.path.exists(keys_path):
+            return
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        row_size = 4 * self.dim
+        with open(keys_path, "rb") as f:
+            keys = f.read()
+        self.count = min(len(keys) // KEY_SIZE, os.path.getsize(vectors_path) // row_size)
+        # Drop a torn tail so later appends stay aligned
+        if len(keys) != self.count * KEY_SIZE:
+            os.truncate(keys_path, self.count * KEY_SIZE)
+        if os.path.getsize(vectors_path) != self.count * row_size:
+            os.truncate(vectors_path, self.count * row_size)
+        self._rows = {keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i for i in range(self.count)}
+
+    def _vectors(self) -> np.ndarray:
+        return np.memmap(os.path.join(self.path, VECTORS_FILE), dtype=np.float32,
+                         mode="r", shape=(self.count, self.dim))
+
+    def get_many(self, hashes: List[str]) -> List[Optional[List[float]]]:
+        """Vectors for the given hex chunk hashes, None where not stored."""
+        rows = [self._rows.get(bytes.fromhex(h)) for h in hashes]
+        found = [r for r in rows if r is not None]
+        self.hits += len(found)
+        self.misses += len(rows) - len(found)
+        if not found:
+            return [None] * len(rows)
+        matrix = self._vectors()[np.array(found)]
+        vectors = iter(matrix.tolist())
+        return [next(vectors) if r is not None else None for r in rows]
+
+    def put_many(self, hashes: List[str], vectors: List[List[float]]) -> None:
+        new = [(bytes.fromhex(h), v) for h, v in zip(hashes, vectors) if bytes.fromhex(h) not in self._rows]
+        if not new:
+            return
+        matrix = np.asarray([v for _, v in new], dtype=np.float32)
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+            with open(os.path.join(self.path, INFO_FILE), "w", encoding="utf-8") as f:
+                json.dump({"model": self.model, "dim": self.dim}, f)
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Vector has dim {matrix.shape[1]}, store has dim {self.dim}.")
+        with open(os.path.join(self.path, VECTORS_FILE), "ab") as f:
+            f.write(matrix.tobytes())
+        with open(os.path.join(self.path, KEYS_FILE), "ab") as f:
+            f.write(b"".join(key for key, _ in new))
+        for key, _ in new:
+            self._rows[key] = self.count
+            self.count += 1
+
+    def compact(self, referenced: Iterable[str]) -> dict:
+        """Rewrites the store keeping only the `referenced` chunk hashes."""
+        keep = sorted({self._rows[k] for k in (bytes.fromhex(h) for h in referenced) if k in self._rows})
+        before = self.count
+        if self.count:
+            tmp_dir = f"{self.path}.tmp-{os.getpid()}-{time.time_ns()}"
+            os.makedirs(tmp_dir)
+            keys_by_row = {row: key for key, row in self._rows.items()}
+            self._vectors()[np.array(keep, dtype=np.int64)].tofile(os.path.join(tmp_dir, VECTORS_FILE))
+            with open(os.path.join(tmp_dir, KEYS_FILE), "wb") as f:
+                f.write(b"".join(keys_by_row[row] for row in keep))
+            shutil.copy(os.path.join(self.path, INFO_FILE), tmp_dir)
+            swap_directory(tmp_dir, self.path)
+            self._load_keys()
+        dropped = before - len(keep)
+        logger.info(f"Compacted embedding store {self.path}: kept {len(keep)}, dropped {dropped}.")
+        return {"kept": len(keep), "dropped": dropped}
+
+    def stats(self) -> dict:
+        return {"model": self.model, "rows": self.count, "dim": self.dim, "hits": self.hits, "misses": self.misses}
+
+
+def compact_from_manifest(model: str = "nomic-embed-text") -> dict:
+    """Drops stored vectors that no chunk in the current manifest references."""
+    from .manifest import Manifest
+
+    referenced = {h for entry in Manifest.load().files.values() for h in entry.get("chunks", [])}
+    return EmbeddingStore(model).compact(referenced)
+
+
+if __name__ == "__main__":
+    # python -m legal_agent.index.embedding_store [compact|stats]
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "compact":
+        print(compact_from_manifest())
+    elif command == "stats":
+        print(EmbeddingStore("nomic-embed-text").stats())
+    else:
+        print(f"Unknown command '{command}'. Use 'compact' or 'stats'.")
+        sys.exit(1)
@@ -0,0 +1,213 @@
+import os
+import re
+import json
+import math
+import time
+import shutil
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import List, Optional
+
+import numpy as np
+
+from legal_agent.tools.semantic_cache import INDEX_DATA_DIR, read_index_generation
+from .local_store import RECORDS_FILE, OFFSETS_FILE, INFO_FILE, swap_directory, read_record
+
+logger = logging.getLogger(__name__)
+
+# Additional files of a lexical index directory (records reuse the local_store layout)
+TERMS_FILE = "terms.npy"                 # sorted fixed-width unicode array, searchsorted for lookup
+TERM_OFFSETS_FILE = "term_offsets.npy"   # (terms + 1,) int64 offsets into the postings arrays
+POSTING_DOCS_FILE = "postings_docs.npy"  # int32 doc ids, grouped by term
+POSTING_TFS_FILE = "postings_tfs.npy"    # uint16 term frequencies, parallel to POSTING_DOCS_FILE
+DOC_LENGTHS_FILE = "doc_lengths.npy"     # int32 tokens per doc
+
+MAX_TERM_LENGTH = 32
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "which with what under shall any such".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric tokens; numbers are kept since section numbers matter."""
+    return [
+        t for t in TOKEN_RE.findall(text.lower())
+        if t not in STOPWORDS and len(t) <= MAX_TERM_LENGTH
+    ]
+
+
+class LexicalIndexWriter:
+    """Builds a BM25 inverted index directory next to the vector index."""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self._tmp_dir = f"{index_dir}.tmp-{os.getpid()}-{time.time_ns()}"
+        os.makedirs(self._tmp_dir)
+        self._records = open(os.path.join(self._tmp_dir, RECORDS_FILE), "wb")
+        self._offsets = [0]
+        self._postings = defaultdict(list)  # term -> [(doc, tf)]
+        self._lengths = []
+        self._info = None
+        self._done = False
+
+    def add(self, record: dict) -> None:
+        doc = len(self._lengths)
+        tokens = tokenize(record["text"])
+        for term, tf in Counter(tokens).items():
+            self._postings[term].append((doc, min(tf, 65535)))
+        self._lengths.append(len(tokens))
+        data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        self._records.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def stage(self) -> None:
+        """Writes the index files into the temp directory, so `commit()` only has to swap it in."""
+        if self._info is not None:
+            return
+        self._records.close()
+        terms = sorted(self._postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        docs, tfs = [], []
+        for i, term in enumerate(terms):
+            postings = self._postings[term]
+            term_offsets[i + 1] = term_offsets[i] + len(postings)
+            docs.extend(d for d, _ in postings)
+            tfs.extend(tf for _, tf in postings)
+
+        def _save(name, array):
+            np.save(os.path.join(self._tmp_dir, name), array)
+
+        _save(TERMS_FILE, np.array(terms, dtype=f"<U{MAX_TERM_LENGTH}"))
+        _save(TERM_OFFSETS_FILE, term_offsets)
+        _save(POSTING_DOCS_FILE, np.array(docs, dtype=np.int32))
+        _save(POSTING_TFS_FILE, np.array(tfs, dtype=np.uint16))
+        _save(DOC_LENGTHS_FILE, np.array(self._lengths, dtype=np.int32))
+        _save(OFFSETS_FILE, np.array(self._offsets, dtype=np.int64))
+        count = len(self._lengths)
+        info = {
+            "count": count,
+            "terms": len(terms),
+            "avg_length": (sum(self._lengths) / count) if count else 0.0,
+        }
+        with open(os.path.join(self._tmp_dir, INFO_FILE), "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        self._info = info
+
+    def commit(self) -> None:
+        self._done = True
+        self.stage()
+        swap_directory(self._tmp_dir, self.index_dir)
+        logger.info(f"Lexical index committed: {self._info['count']} chunks, {self._info['terms']} terms.")
+
+    def abort(self) -> None:
+        """Discards the build; a no-op once commit() has run."""
+        if self._done:
+            return
+        self._done = True
+        self._records.close()
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+
+class LexicalIndex:
+    """
+    BM25 search over a lexical index directory. Every array is opened with
+    mmap_mode="r", so loading costs a few file opens regardless of corpus size.
+    """
+
+    def __init__(self, index_dir: str, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        with open(os.path.join(index_dir, INFO_FILE), encoding="utf-8") as f:
+            self.info = json.load(f)
+        self.count = self.info["count"]
+
+        def _load(name):
+            return np.load(os.path.join(index_dir, name), mmap_mode="r")
+
+        self.terms = _load(TERMS_FILE)
+        self.term_offsets = _load(TERM_OFFSETS_FILE)
+        self.posting_docs = _load(POSTING_DOCS_FILE)
+        self.posting_tfs = _load(POSTING_TFS_FILE)
+        self.doc_lengths = _load(DOC_LENGTHS_FILE)
+        self.offsets = _load(OFFSETS_FILE)
+        self.records = np.memmap(os.path.join(index_dir, RECORDS_FILE), dtype=np.uint8, mode="r") if self.count else None
+
+    @classmethod
+    def exists(cls, index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, INFO_FILE))
+
+    def _term_id(self, term: str) -> Optional[int]:
+        i = int(np.searchsorted(self.terms, term))
+        if i < len(self.terms) and self.terms[i] == term:
+            return i
+        return None
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        """Top-`limit` records by BM25, each with a `bm25` score field."""
+        if not self.count:
+            return []
+        scores = np.zeros(self.count, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / max(self.info["avg_length"], 1e-9))
+        for term in set(tokenize(query)):
+            t = self._term_id(term)
+            if t is None:
+                continue
+            start, end = self.term_offsets[t], self.term_offsets[t + 1]
+            docs = self.posting_docs[start:end]
+            tfs = self.posting_tfs[start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+
+        k = min(limit, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {**read_record(self.records, self.offsets, int(d)), "bm25": float(scores[d])}
+            for d in top
+        ]
+
+
+def reciprocal_rank_fusion(result_lists: List[List[dict]], limit: int = 10, k: int = 60) -> List[dict]:
+    """
+    Merges ranked hit lists by summing 1 / (k + rank). Hits are matched on
+    (source, text); the merged hit keeps every field seen and gets an `rrf` score.
+    """
+    fused = {}
+    for hits in result_lists:
+        for rank, hit in enumerate(hits, start=1):
+            key = (hit.get("source"), hit.get("text"))
+            entry = fused.setdefault(key, {"rrf": 0.0})
+            for field, value in hit.items():
+                entry.setdefault(field, value)
+            entry["rrf"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda h: h["rrf"], reverse=True)[:limit]
+
+
+# Global index (Lazy loaded, reopened when ingestion bumps the generation)
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", os.path.join(INDEX_DATA_DIR, "lexical"))
+_index = None
+_index_generation = None
+_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> Optional[LexicalIndex]:
+    """Returns the lexical index, or None if hybrid search is off or no index was built yet."""
+    global _index, _index_generation
+    if os.getenv("HYBRID_SEARCH", "1") == "0":
+        return None
+    generation = read_index_generation()
+    if _index is None or generation != _index_generation:
+        with _index_lock:
+            if _index is None or generation != _index_generation:
+                if not LexicalIndex.exists(LEXICAL_INDEX_DIR):
+                    return None
+                _index = LexicalIndex(LEXICAL_INDEX_DIR)
+                _index_generation = generation
+                logger.info(f"Opened lexical index ({_index.count} chunks, {_index.info['terms']} terms).")
+    return _index
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import shutil
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# File layout of a local index directory
+VECTORS_FILE = "vectors.f32"         # (count, dim) float32, L2-normalized rows
+RECORDS_FILE = "chunks.bin"          # concatenated JSON records (text, source, ...)
+OFFSETS_FILE = "chunk_offsets.npy"   # (count + 1,) int64 byte offsets into RECORDS_FILE
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_OFFSETS_FILE = "ivf_offsets.npy"  # (lists + 1,) row offsets; rows are grouped by list
+INFO_FILE = "index.json"
+
+
+def swap_directory(tmp_dir: str, final_dir: str) -> None:
+    """Moves a fully written `tmp_dir` into place, replacing `final_dir`."""
+    old_dir = f"{final_dir}.old-{time.time_ns()}"
+    if os.path.exists(final_dir):
+        os.replace(final_dir, old_dir)
+    os.replace(tmp_dir, final_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def read_record(records: np.ndarray, offsets: np.ndarray, row: int) -> dict:
+    """Decodes record `row` from a memory-mapped RECORDS_FILE."""
+    data = records[offsets[row]:offsets[row + 1]]
+    return json.loads(data.tobytes().decode("utf-8"))
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over normalized rows; returns the (k, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(k):
+            members = vectors[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+            else:
+                centroids[c] = vectors[rng.integers(len(vectors))]
+        centroids = _normalize_rows(centroids)
+    return centroids.astype(np.float32)
+
+
+class LocalIndexWriter:
+    """
+    Builds a local index directory. Vectors are streamed to disk as they are
+    added, so memory use does not depend on corpus size until the optional IVF
+    step. `commit()` writes everything into a sibling temp directory and swaps
+    it into place, so readers never see a half-written index.
+    """
+
+    def __init__(self, index_dir: str, ivf_lists: int = 0):
+        self.index_dir = index_dir
+        self.ivf_lists = ivf_lists
+        self._tmp_dir = f"{index_dir}.tmp-{os.getpid()}-{time.time_ns()}"
+        os.makedirs(self._tmp_dir)
+        self._vectors = open(os.path.join(self._tmp_dir, VECTORS_FILE), "wb")
+        self._records = open(os.path.join(self._tmp_dir, RECORDS_FILE), "wb")
+        self._offsets = [0]
+        self.dim = None
+        self.count = 0
+        self._done = False
+
+    def add(self, vector: List[float], record: dict, chunk_id: Optional[str] = None) -> None:
+        v = np.asarray(vector, dtype=np.float32)
+        if self.dim is None:
+            self.dim = v.shape[0]
+        elif v.shape[0] != self.dim:
+            raise ValueError(f"Vector has dim {v.shape[0]}, index has dim {self.dim}.")
+        norm = np.linalg.norm(v)
+        self._vectors.write((v / norm if norm else v).tobytes())
+        data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        self._records.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        self.count += 1
+
+    def _build_ivf(self) -> dict:
+        vectors = np.fromfile(os.path.join(self._tmp_dir, VECTORS_FILE), dtype=np.float32).reshape(self.count, self.dim)
+        lists = min(self.ivf_lists, self.count)
+        centroids = _kmeans(vectors, lists)
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+
+        # Rewrite vectors and records grouped by list so each list is a contiguous slice
+        vectors[order].tofile(os.path.join(self._tmp_dir, VECTORS_FILE))
+        offsets = np.asarray(self._offsets, dtype=np.int64)
+        records_path = os.path.join(self._tmp_dir, RECORDS_FILE)
+        with open(records_path, "rb") as f:
+            blob = f.read()
+        new_offsets = [0]
+        with open(records_path, "wb") as f:
+            for row in order:
+                data = blob[offsets[row]:offsets[row + 1]]
+                f.write(data)
+                new_offsets.append(new_offsets[-1] + len(data))
+        self._offsets = new_offsets
+
+        list_offsets = np.searchsorted(assign[order], np.arange(lists + 1)).astype(np.int64)
+        np.save(os.path.join(self._tmp_dir, IVF_CENTROIDS_FILE), centroids)
+        np.save(os.path.join(self._tmp_dir, IVF_OFFSETS_FILE), list_offsets)
+        return {"lists": lists}
+
+    def commit(self, info: Optional[dict] = None) -> None:
+        self._done = True
+        self._vectors.close()
+        self._records.close()
+        ivf = None
+        if self.ivf_lists and self.count:
+            ivf = self._build_ivf()
+        np.save(os.path.join(self._tmp_dir, OFFSETS_FILE), np.asarray(self._offsets, dtype=np.int64))
+        with open(os.path.join(self._tmp_dir, INFO_FILE), "w", encoding="utf-8") as f:
+            json.dump({**(info or {}), "dim": self.dim, "count": self.count, "ivf": ivf}, f)
+
+        swap_directory(self._tmp_dir, self.index_dir)
+        logger.info(f"Local index committed: {self.count} chunks, dim={self.dim}, ivf={ivf}")
+
+    def abort(self) -> None:
+        """Discards the build; a no-op once commit() has run (the swapped-in index is live)."""
+        if self._done:
+            return
+        self._done = True
+        self._vectors.close()
+        self._records.close()
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+
+class LocalVectorIndex:
+    """
+    Read side of a local index. Vectors and records are memory-mapped, so
+    opening is O(1) and only the rows a query touches are paged in.
+    """
+
+    def __init__(self, index_dir: str, nprobe: int = 8):
+        self.index_dir = index_dir
+        self.nprobe = nprobe
+        with open(os.path.join(index_dir, INFO_FILE), encoding="utf-8") as f:
+            self.info = json.load(f)
+        self.count = self.info["count"]
+        self.dim = self.info["dim"]
+        if self.count:
+            self.vectors = np.memmap(os.path.join(index_dir, VECTORS_FILE), dtype=np.float32,
+                                     mode="r", shape=(self.count, self.dim))
+            self.records = np.memmap(os.path.join(index_dir, RECORDS_FILE), dtype=np.uint8, mode="r")
+        else:
+            self.vectors = np.zeros((0, self.dim or 0), dtype=np.float32)
+            self.records = None
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode="r")
+        self.centroids = None
+        if self.info.get("ivf"):
+            self.centroids = np.load(os.path.join(index_dir, IVF_CENTROIDS_FILE))
+            self.list_offsets = np.load(os.path.join(index_dir, IVF_OFFSETS_FILE))
+            # k-means can leave clusters empty; probing only those would find nothing
+            self.nonempty_lists = np.flatnonzero(np.diff(self.list_offsets))
+
+    @classmethod
+    def exists(cls, index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, INFO_FILE))
+
+    def record(self, row: int) -> dict:
+        return read_record(self.records, self.offsets, row)
+
+    def _candidate_rows(self, q: np.ndarray) -> Optional[np.ndarray]:
+        """Row ids in the `nprobe` nearest non-empty IVF lists, or None to scan everything."""
+        if self.centroids is None:
+            return None
+        nonempty = self.nonempty_lists
+        if self.nprobe >= len(nonempty):
+            return None
+        probe = nonempty[np.argpartition(-(self.centroids[nonempty] @ q), self.nprobe - 1)[:self.nprobe]]
+        return np.concatenate([
+            np.arange(self.list_offsets[c], self.list_offsets[c + 1]) for c in probe
+        ])
+
+    def search(self, vector: List[float], limit: int = 10) -> List[dict]:
+        """Top-`limit` records by cosine similarity, each with a `distance` field."""
+        if not self.count:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+        rows = self._candidate_rows(q)
+        scores = (self.vectors if rows is None else self.vectors[rows]) @ q
+        k = min(limit, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        hits = []
+        for i in top:
+            row = int(i if rows is None else rows[i])
+            hits.append({**self.record(row), "distance": float(1.0 - scores[i])})
+        return hits
@@ -0,0 +1,60 @@
+import os
+import json
+import hashlib
+from typing import Dict, Optional
+
+from legal_agent.tools.semantic_cache import INDEX_DATA_DIR
+
+MANIFEST_FILE = os.path.join(INDEX_DATA_DIR, "manifest.json")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_hash(text: str) -> str:
+    """Content hash of a chunk's text (also the key used to reuse its embedding)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """
+    Record of what the current index was built from: the backend, the chunking
+    parameters and, per PDF, its content hash and the hashes of its chunks.
+    """
+
+    def __init__(self, backend: Optional[str] = None, chunking: Optional[dict] = None,
+                 files: Optional[Dict[str, dict]] = None):
+        self.backend = backend
+        self.chunking = chunking or {}
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, path: str = MANIFEST_FILE) -> "Manifest":
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("backend"), data.get("chunking"), data.get("files"))
+
+    def save(self, path: str = MANIFEST_FILE) -> None:
+        """Atomic write (temp file + rename), so a crash never leaves half a manifest."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"backend": self.backend, "chunking": self.chunking, "files": self.files}, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def diff(self, current: Dict[str, str]) -> dict:
+        """Compares `current` ({file: sha256}) with the manifest."""
+        added = [f for f in current if f not in self.files]
+        changed = [f for f in current if f in self.files and self.files[f]["sha256"] != current[f]]
+        unchanged = [f for f in current if f in self.files and self.files[f]["sha256"] == current[f]]
+        removed = [f for f in self.files if f not in current]
+        return {"added": added, "changed": changed, "unchanged": unchanged, "removed": removed}
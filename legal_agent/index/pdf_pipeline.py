@@ -0,0 +1,101 @@
+import os
+import logging
+import multiprocessing
+from collections import deque
+from itertools import groupby
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "16"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or (os.cpu_count() or 1)
+
+
+def iter_page_texts(path: str, start: int = 0, end: int = None) -> Iterator[str]:
+    """Extracts pages [start, end) one at a time; only the current page is materialized."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    end = len(reader.pages) if end is None else min(end, len(reader.pages))
+    for number in range(start, end):
+        # Same extraction PyPDFLoader uses, so chunk hashes stay stable
+        yield reader.pages[number].extract_text(extraction_mode="plain").strip()
+
+
+def iter_page_chunks(pages: Iterator[str], chunk_size: int, chunk_overlap: int) -> Iterator[str]:
+    """Splits each page as it arrives (chunks never span pages, as with split_documents)."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for text in pages:
+        yield from splitter.split_text(text)
+
+
+def page_count(path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def _extract_page_range(path: str, start: int, end: int) -> List[str]:
+    """Process pool task: text of pages [start, end) of one PDF."""
+    return list(iter_page_texts(path, start, end))
+
+
+def iter_chunks(pages: Iterator[str], chunking: dict, source: str = "") -> Iterator[dict]:
+    """Chunks one PDF's pages (in order) with the splitter named in `chunking`."""
+    if chunking.get("splitter") == "statute":
+        from .statute import iter_statute_chunks
+
+        yield from iter_statute_chunks(pages, chunking["chunk_size"], chunking["chunk_overlap"], source)
+    else:
+        for text in iter_page_chunks(pages, chunking["chunk_size"], chunking["chunk_overlap"]):
+            yield {"text": text}
+
+
+def _iter_pages_parallel(tasks: list, workers: int) -> Iterator[Tuple[str, str]]:
+    """Yields (file, page_text) for the (file, path, start, end) `tasks`, in order."""
+    # Spawned, not forked: the server ingests from a worker thread, and forking a
+    # threaded process can leave the children holding locks nobody will release
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        queued = iter(tasks)
+        for file, path, start, end in queued:
+            pending.append((file, pool.submit(_extract_page_range, path, start, end)))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            file, future = pending.popleft()
+            pages = future.result()
+            # Refill before yielding so workers stay busy while the consumer embeds
+            for next_file, path, start, end in queued:
+                pending.append((next_file, pool.submit(_extract_page_range, path, start, end)))
+                break
+            for page in pages:
+                yield file, page
+
+
+def iter_chunks_parallel(data_path: str, files: List[str], chunking: dict,
+                         workers: int = INGEST_WORKERS, pages_per_task: int = PAGES_PER_TASK) -> Iterator[Tuple[str, dict]]:
+    """
+    Yields (file, chunk) for `files`, in file and page order. A chunk is a dict
+    with the chunk "text" plus whatever metadata the splitter attaches.
+
+    pypdf parsing is CPU-bound, so every PDF is cut into page ranges that are
+    parsed across a process pool. At most 2 * `workers` ranges are in flight,
+    which bounds memory to a few ranges of pages however large a PDF is, while
+    keeping every core busy. Pages come back in order and are chunked here, so
+    a splitter can follow sections across page breaks.
+    """
+    tasks = []
+    for file in files:
+        path = os.path.join(data_path, file)
+        pages = page_count(path)
+        print(f"Processing {file} ({pages} pages)...")
+        tasks.extend((file, path, start, min(start + pages_per_task, pages)) for start in range(0, pages, pages_per_task))
+
+    for file, pages in groupby(_iter_pages_parallel(tasks, workers), key=itemgetter(0)):
+        for chunk in iter_chunks((page for _, page in pages), chunking, file):
+            yield file, chunk
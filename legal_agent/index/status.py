@@ -0,0 +1,84 @@
+import time
+import threading
+from typing import Optional
+
+
+class IngestionCancelled(Exception):
+    pass
+
+
+class IndexStatus:
+    """
+    Readiness of the retrieval index, as reported by the background ingestion
+    job. States:
+
+    - "unknown": no job is tracking the index (scripts, `adk web`); retrieval
+      is attempted as usual.
+    - "checking" / "ingesting": the job is running; retrieval is degraded.
+    - "retrying": the last check or ingestion failed and the job is waiting to
+      try again; retrieval is attempted, since the served index may be fine.
+    - "ready": the index can be queried.
+    - "unavailable": no index is configured; retrieval is degraded.
+    - "failed": the job gave up; retrieval is attempted as with "unknown".
+    """
+
+    DEGRADED = frozenset({"checking", "ingesting", "unavailable"})
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self.state = "unknown"
+        self.detail = None
+        self.progress = {}
+        self.started_at = None
+        self.finished_at = None
+
+    def set_state(self, state: str, detail: Optional[str] = None) -> None:
+        with self._lock:
+            self.state = state
+            self.detail = detail
+            if state == "checking":
+                self.started_at, self.finished_at, self.progress = time.time(), None, {}
+            elif state in ("ready", "unavailable", "failed"):
+                self.finished_at = time.time()
+
+    def update(self, **progress) -> None:
+        """Merges progress counters (files, chunks_embedded, ...) reported by ingest()."""
+        with self._lock:
+            self.progress.update(progress)
+
+    @property
+    def degraded(self) -> bool:
+        return self.state in self.DEGRADED
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def sleep(self, seconds: float) -> None:
+        """Waits between attempts, raising IngestionCancelled as soon as shutdown cancels the job."""
+        if self._cancelled.wait(seconds):
+            self.raise_if_cancelled()
+
+    def raise_if_cancelled(self) -> None:
+        if self._cancelled.is_set():
+            raise IngestionCancelled("Ingestion cancelled by shutdown.")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = None
+            if self.started_at is not None:
+                elapsed = round((self.finished_at or time.time()) - self.started_at, 1)
+            return {
+                "state": self.state,
+                "detail": self.detail,
+                "progress": dict(self.progress),
+                "elapsed_seconds": elapsed,
+            }
+
+
+# Global status (one per process)
+_status = IndexStatus()
+
+
+def get_index_status() -> IndexStatus:
+    return _status
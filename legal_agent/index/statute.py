@@ -0,0 +1,220 @@
+import os
+import re
+import json
+import logging
+import threading
+from typing import Iterator, List, Optional
+
+from legal_agent.tools.semantic_cache import INDEX_DATA_DIR, read_index_generation
+
+logger = logging.getLogger(__name__)
+
+SECTION_INDEX_FILE = os.getenv("SECTION_INDEX_FILE", os.path.join(INDEX_DATA_DIR, "sections.json"))
+
+# Act header line on the first page, e.g. "THE RIGHT TO INFORMATION ACT, 2005"
+TITLE_RE = re.compile(r"^\s*THE\s+[A-Z][A-Z ()]+,\s*\d{4}\s*$")
+# Sections are only recognized after the enacting formula; before it is the arrangement of sections
+ENACTED_RE = re.compile(r"^\s*BE it enacted", re.IGNORECASE)
+CHAPTER_RE = re.compile(r"^\s*CHAPTER\s+([IVXLC]+[A-Z]?)\s*$")
+SCHEDULE_RE = re.compile(r"^\s*THE\s+[A-Z]+\s+SCHEDULE\b")
+# "13. Term of office and conditions of service. —(1) ..." or "15.Nothing is an offence ..." (BNS
+# prints headings in the margin, so they are not recovered there)
+SECTION_RE = re.compile(r"^\s*(\d{1,3})([A-Z]{0,2})\.\s*(?=\S)(?!\d)(.*)$")
+HEADING_RE = re.compile(r"^([A-Z][^—–]{0,150}?)\s*\.\s*[—–-]")
+PAGE_NUMBER_RE = re.compile(r"^\s*\d{1,4}\s*$")
+# A section number may skip ahead over omitted sections, but not further than this
+MAX_SECTION_GAP = 10
+
+# Short names people use for the acts, mapped to a fragment of the act key
+ACT_ALIASES = {
+    "rera": "realestate",
+    "real estate": "realestate",
+    "rti": "righttoinformation",
+    "right to information": "righttoinformation",
+    "bns": "bharatiyanyayasanhita",
+    "nyaya sanhita": "bharatiyanyayasanhita",
+    "cpa": "consumerprotection",
+    "consumer protection": "consumerprotection",
+}
+SECTION_QUERY_RE = re.compile(r"\b(?:section|sec\.?|s\.)\s*(\d{1,3}[a-z]{0,2})\b", re.IGNORECASE)
+
+
+def act_key(title: str) -> str:
+    """Spacing-insensitive key of an act title ("THE BHARA TIY A NY A Y A SANHITA" -> "bharatiyanyayasanhita")."""
+    key = re.sub(r"[^a-z]", "", title.lower())
+    return key[3:] if key.startswith("the") else key
+
+
+def _split(text: str, splitter) -> List[str]:
+    return splitter.split_text(text) if text.strip() else []
+
+
+def iter_statute_chunks(pages: Iterator[str], chunk_size: int, chunk_overlap: int,
+                        source: str = "") -> Iterator[dict]:
+    """
+    Chunks an act along its structure: every section becomes its own chunk (or
+    several, if it is longer than `chunk_size`), tagged with the act, chapter,
+    section number and heading. Sections may span pages, so pages are consumed
+    in order and only the current section is buffered. Text outside sections
+    (arrangement of sections, preamble, schedules) is chunked page by page.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    act = os.path.splitext(source)[0]
+    titled = enacted = False
+    chapter = None
+    section = heading = None
+    last_number = 0
+    buffer = []
+
+    def _flush():
+        meta = {"act": act, "chapter": chapter, "section": section, "heading": heading}
+        for text in _split("\n".join(buffer), splitter):
+            yield {"text": text, **meta}
+        buffer.clear()
+
+    for page in pages:
+        lines = page.splitlines()
+        # Running page numbers would end up in the middle of sections
+        while lines and PAGE_NUMBER_RE.match(lines[0]):
+            lines.pop(0)
+        while lines and PAGE_NUMBER_RE.match(lines[-1]):
+            lines.pop()
+        expect_chapter_title = False
+        for line in lines:
+            if not titled:
+                match = TITLE_RE.match(line)
+                if match:
+                    act, titled = line.strip(), True
+            if not enacted:
+                enacted = bool(ENACTED_RE.match(line))
+                buffer.append(line)
+                continue
+
+            if expect_chapter_title and line.strip():
+                chapter = f"{chapter} {line.strip()}"
+                expect_chapter_title = False
+            match = CHAPTER_RE.match(line)
+            if match:
+                yield from _flush()
+                section = heading = None
+                chapter = f"CHAPTER {match.group(1)}"
+                expect_chapter_title = True
+            elif SCHEDULE_RE.match(line):
+                yield from _flush()
+                section = heading = chapter = None
+            else:
+                match = SECTION_RE.match(line)
+                number = int(match.group(1)) if match else 0
+                # Numbered lines are also footnotes and list items: a section number
+                # must follow the previous one, or be a lettered insertion ("12A")
+                if match and (last_number < number <= last_number + MAX_SECTION_GAP
+                              or (number == last_number and match.group(2))):
+                    # Chapter headings and preamble lines on the same page open the first section
+                    if section is not None:
+                        yield from _flush()
+                    section, last_number = f"{number}{match.group(2)}", number
+                    title = HEADING_RE.match(match.group(3))
+                    heading = title.group(1).strip() if title else None
+            buffer.append(line)
+        if section is None:
+            yield from _flush()
+    yield from _flush()
+
+
+class SectionIndexWriter:
+    """Collects the chunks of every (act, section) into one JSON file for direct lookup."""
+
+    def __init__(self, path: str = SECTION_INDEX_FILE):
+        self.path = path
+        self.acts = {}
+        self._tmp_path = f"{path}.tmp"
+        self._staged = False
+        self._done = False
+
+    def add(self, record: dict) -> None:
+        if not record.get("section"):
+            return
+        act = self.acts.setdefault(act_key(record["act"]), {"title": record["act"], "sections": {}})
+        act["sections"].setdefault(record["section"].upper(), []).append(record)
+
+    def stage(self) -> None:
+        """Writes the index next to the served one, so `commit()` only has to rename it."""
+        if self._staged:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self._tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"acts": self.acts}, f, ensure_ascii=False)
+        self._staged = True
+
+    def commit(self) -> None:
+        self._done = True
+        self.stage()
+        os.replace(self._tmp_path, self.path)
+        sections = sum(len(a["sections"]) for a in self.acts.values())
+        logger.info(f"Section index committed: {len(self.acts)} acts, {sections} sections.")
+
+    def abort(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        self.acts = {}
+        if self._staged:
+            try:
+                os.remove(self._tmp_path)
+            except OSError:
+                pass
+
+
+class SectionIndex:
+    """Maps "Section 17 of RERA" style references straight to the chunks of that section."""
+
+    def __init__(self, path: str = SECTION_INDEX_FILE):
+        with open(path, encoding="utf-8") as f:
+            self.acts = json.load(f)["acts"]
+
+    def resolve_act(self, query: str) -> Optional[str]:
+        """Key of the one act the query refers to, by alias or (spacing-insensitive) title."""
+        lowered = query.lower()
+        compact = re.sub(r"[^a-z]", "", lowered)
+        found = set()
+        for alias, fragment in ACT_ALIASES.items():
+            if re.search(rf"\b{re.escape(alias)}\b", lowered):
+                found.update(key for key in self.acts if fragment in key)
+        found.update(key for key in self.acts if key in compact)
+        return found.pop() if len(found) == 1 else None
+
+    def lookup(self, query: str) -> Optional[List[dict]]:
+        """Chunks of the sections the query cites, or None unless every cited section is known."""
+        numbers = [n.upper() for n in SECTION_QUERY_RE.findall(query)]
+        if not numbers:
+            return None
+        key = self.resolve_act(query)
+        if key is None:
+            return None
+        sections = self.acts[key]["sections"]
+        if not all(n in sections for n in numbers):
+            return None
+        return [record for n in dict.fromkeys(numbers) for record in sections[n]]
+
+
+# Global index (Lazy loaded, reopened when ingestion bumps the generation)
+_index = None
+_index_generation = None
+_index_lock = threading.Lock()
+
+
+def get_section_index() -> Optional[SectionIndex]:
+    """Returns the section index, or None if no statute-aware ingestion has run yet."""
+    global _index, _index_generation
+    generation = read_index_generation()
+    if _index is None or generation != _index_generation:
+        with _index_lock:
+            if _index is None or generation != _index_generation:
+                if not os.path.exists(SECTION_INDEX_FILE):
+                    return None
+                _index = SectionIndex(SECTION_INDEX_FILE)
+                _index_generation = generation
+                logger.info(f"Opened section index ({len(_index.acts)} acts).")
+    return _index
@@ -1,69 +1,239 @@
 import os
-import weaviate
-import weaviate.classes.config as wc
-from weaviate.auth import AuthApiKey
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from langchain_ollama import OllamaEmbeddings
 from dotenv import load_dotenv
 
+from legal_agent.index import get_backend
+from legal_agent.index.lexical import LexicalIndexWriter, LEXICAL_INDEX_DIR
+from legal_agent.index.manifest import Manifest, chunk_hash, file_sha256
+from legal_agent.index.embedding_store import EmbeddingStore
+from legal_agent.index.pdf_pipeline import iter_chunks_parallel
+from legal_agent.index.statute import SectionIndexWriter
+from legal_agent.index.status import IngestionCancelled
+from legal_agent.tools.semantic_cache import bump_index_generation
+
 load_dotenv()
 
-def ingest():
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MODEL = "nomic-embed-text"
+# Changing these invalidates every chunk, so they are part of the manifest
+CHUNKING = {"splitter": "statute", "chunk_size": 2000, "chunk_overlap": 200}
+# Tries of the startup index job, and the wait before the first retry (doubled each time)
+INDEX_STARTUP_ATTEMPTS = int(os.getenv("INDEX_STARTUP_ATTEMPTS", "5"))
+INDEX_STARTUP_BACKOFF = float(os.getenv("INDEX_STARTUP_BACKOFF", "5"))
+
+def _batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _embed_batches(embeddings, items, store=None, batch_size=EMBED_BATCH_SIZE, concurrency=EMBED_CONCURRENCY):
+    """
+    Yields (batch, vectors) for (file, chunk) items in input order, keeping up to `concurrency`
+    embed_documents requests to Ollama in flight while earlier batches are written.
+    Chunks already in `store` (an EmbeddingStore) are not sent to Ollama, and
+    newly embedded ones are added to it.
+    """
+    def _complete(batch, hashes, vectors, future):
+        if future is not None:
+            fresh = iter(future.result())
+            missing = [i for i, v in enumerate(vectors) if v is None]
+            for i in missing:
+                vectors[i] = next(fresh)
+            if store is not None:
+                store.put_many([hashes[i] for i in missing], [vectors[i] for i in missing])
+        return batch, vectors
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed") as pool:
+        pending = deque()
+        for batch in _batched(items, batch_size):
+            hashes = [chunk_hash(chunk["text"]) for _, chunk in batch]
+            vectors = store.get_many(hashes) if store is not None else [None] * len(batch)
+            texts = [chunk["text"] for (_, chunk), v in zip(batch, vectors) if v is None]
+            future = pool.submit(embeddings.embed_documents, texts) if texts else None
+            pending.append((batch, hashes, vectors, future))
+            if len(pending) >= concurrency:
+                yield _complete(*pending.popleft())
+        while pending:
+            yield _complete(*pending.popleft())
+
+def ingest(full: bool = False, status=None):
+    """
+    Brings the index in line with the PDFs in legal_agent/data.
+
+    Only new or changed PDFs are parsed and embedded. Chunks of unchanged PDFs
+    are copied over from the served index with their vectors, and chunks of
+    removed PDFs are left out. The result is built as a new index version and
+    swapped in atomically, so queries never see an empty or partial index.
+    `full=True` re-processes every PDF. Progress is reported to `status` (an
+    IndexStatus), which can also cancel the run between batches.
+    """
     print("--- Starting Ingestion ---")
     base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-    embeddings = OllamaEmbeddings(model="nomic-embed-text", base_url=base_url)
-    
-    # Connect
-    client = weaviate.connect_to_weaviate_cloud(
-        cluster_url=os.getenv("WEAVIATE_URL"),
-        auth_credentials=AuthApiKey(os.getenv("WEAVIATE_API_KEY"))
-    )
-    
-    try:
-        # 1. Reset Collection
-        if client.collections.exists("LegalDocs"):
-            client.collections.delete("LegalDocs")
-            
-        client.collections.create(
-            name="LegalDocs",
-            properties=[
-                wc.Property(name="text", data_type=wc.DataType.TEXT),
-                wc.Property(name="source", data_type=wc.DataType.TEXT),
-            ],
-            vectorizer_config=wc.Configure.Vectorizer.none() # Own vectors
-        )
-        
-        collection = client.collections.get("LegalDocs")
-        
-        # 2. Process PDFs
-        # We look for the 'data' folder relative to this script
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        data_path = os.path.join(base_path, "data")
-        
-        if not os.path.exists(data_path):
-            os.makedirs(data_path)
-            print(f"Created {data_path}. Add PDFs and rerun.")
+    embeddings = OllamaEmbeddings(model=EMBED_MODEL, base_url=base_url)
+    # Vectors of chunks embedded in earlier runs, keyed by (model, chunk sha256)
+    store = EmbeddingStore(EMBED_MODEL)
+
+    # We look for the 'data' folder relative to this script
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(base_path, "data")
+
+    if not os.path.exists(data_path):
+        os.makedirs(data_path)
+        print(f"Created {data_path}. Add PDFs and rerun.")
+        return
+
+    # 1. Diff the PDFs against the manifest of the served index
+    backend = get_backend()
+    print(f"Using {backend.name} backend.")
+    current = {
+        file: file_sha256(os.path.join(data_path, file))
+        for file in sorted(os.listdir(data_path)) if file.endswith(".pdf")
+    }
+    manifest = Manifest.load()
+    diff = manifest.diff(current)
+    if full or manifest.backend != backend.name or manifest.chunking != CHUNKING or backend.count() == 0:
+        print("Full rebuild.")
+        keep, process = set(), list(current)
+    else:
+        keep, process = set(diff["unchanged"]), diff["added"] + diff["changed"]
+        print(f"Added: {diff['added']}, changed: {diff['changed']}, removed: {diff['removed']}")
+        if not process and not diff["removed"]:
+            print("Index is up to date.")
+            print("--- Done ---")
             return
 
-        for file in os.listdir(data_path):
-            if file.endswith(".pdf"):
-                print(f"Processing {file}...")
-                loader = PyPDFLoader(os.path.join(data_path, file))
-                chunks = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=200).split_documents(loader.load())
-                
-                with collection.batch.dynamic() as batch:
-                    for chunk in chunks:
-                        vector = embeddings.embed_query(chunk.page_content)
-                        batch.add_object(
-                            properties={"text": chunk.page_content, "source": file},
-                            vector=vector
-                        )
-                print(f"Uploaded {file}")
-                
+    if status is not None:
+        status.update(files=len(process), carried_files=len(keep), chunks_embedded=0)
+
+    # 2. Build the new index version next to the served one
+    writer = backend.writer()
+    # BM25 index for exact tokens ("Section 17", "48 hours"), searched alongside vectors
+    lexical_writer = LexicalIndexWriter(LEXICAL_INDEX_DIR)
+    # (act, section) -> chunks, so "Section 17 of RERA" needs no search at all
+    section_writer = SectionIndexWriter()
+    new_manifest = Manifest(backend.name, CHUNKING, {f: manifest.files[f] for f in keep})
+    committed = False
+
+    try:
+        carried = 0
+        for record, vector in backend.iter_chunks(keep):
+            writer.add(vector, record, chunk_id=chunk_hash(record["text"]))
+            lexical_writer.add(record)
+            section_writer.add(record)
+            carried += 1
+        print(f"Carried over {carried} chunks from {len(keep)} unchanged PDFs.")
+
+        # 3. Embed in batches and pipeline the vectors straight into the writers
+        for file in process:
+            new_manifest.files[file] = {"sha256": current[file], "chunks": []}
+        started = time.perf_counter()
+        total_chunks = total_bytes = 0
+        for batch, vectors in _embed_batches(embeddings, iter_chunks_parallel(data_path, process, CHUNKING), store):
+            for (file, chunk), vector in zip(batch, vectors):
+                record = {**chunk, "source": file}
+                chunk_id = chunk_hash(record["text"])
+                writer.add(vector, record, chunk_id=chunk_id)
+                lexical_writer.add(record)
+                section_writer.add(record)
+                new_manifest.files[file]["chunks"].append(chunk_id)
+                total_bytes += len(record["text"].encode("utf-8"))
+            total_chunks += len(batch)
+            elapsed = time.perf_counter() - started
+            if status is not None:
+                status.update(chunks_embedded=total_chunks)
+                status.raise_if_cancelled()
+            print(f"Embedded {total_chunks} chunks "
+                  f"({total_chunks / elapsed:.1f} chunks/s, {total_bytes / elapsed / 1024:.1f} KB/s)")
+
+        # 4. Atomic swap, then record what the served index was built from. The local
+        # indexes are written out first but only swapped in once the vector index is
+        # served, so a failed vector commit leaves all three on the old corpus.
+        lexical_writer.stage()
+        section_writer.stage()
+        writer.commit({"model": EMBED_MODEL})
+        committed = True
+        lexical_writer.commit()
+        section_writer.commit()
+        new_manifest.save()
+        # Cached result sets refer to the old index
+        bump_index_generation()
+
+        elapsed = time.perf_counter() - started
+        print(f"Ingested {total_chunks} chunks ({total_bytes / 1024:.0f} KB) in {elapsed:.1f}s: "
+              f"{total_chunks / elapsed:.1f} chunks/s, {total_bytes / elapsed / 1024:.1f} KB/s "
+              f"(batch size {EMBED_BATCH_SIZE}, concurrency {EMBED_CONCURRENCY})")
+        print(f"Embedding store: {store.stats()}")
+
     finally:
-        client.close()
+        if not committed:
+            writer.abort()
+            lexical_writer.abort()
+            section_writer.abort()
         print("--- Done ---")
 
+def ensure_index(status, attempts: int = INDEX_STARTUP_ATTEMPTS, backoff: float = INDEX_STARTUP_BACKOFF):
+    """
+    Startup job: ingests if the served index is missing or empty, tracking
+    progress in `status`. Runs in a worker thread so the server starts taking
+    requests immediately; chat stays available (web search only) meanwhile.
+
+    A failed check or ingestion (a Weaviate or Ollama hiccup) is retried with
+    exponential backoff. If every attempt fails the state becomes "failed",
+    and retrieval goes back to querying whatever index is served.
+    """
+    backend = get_backend()
+    if backend.name != "local" and not os.getenv("WEAVIATE_URL"):
+        status.set_state("unavailable", "WEAVIATE_URL is not set.")
+        return
+    try:
+        for attempt in range(1, attempts + 1):
+            try:
+                _check_index(backend, status)
+                return
+            except IngestionCancelled:
+                raise
+            except Exception as e:
+                if attempt == attempts:
+                    logger.exception(f"Startup index job failed after {attempts} attempts: {e}")
+                    status.set_state("failed", str(e))
+                    return
+                delay = backoff * 2 ** (attempt - 1)
+                logger.warning(f"Startup index job failed (attempt {attempt} of {attempts}), "
+                               f"retrying in {delay:g}s: {e}")
+                status.set_state("retrying", str(e))
+                status.sleep(delay)
+    except IngestionCancelled as e:
+        status.set_state("failed", str(e))
+
+def _check_index(backend, status):
+    status.set_state("checking")
+    # Weaviate: borrows from the shared pool so the first chat reuses the connection
+    count = backend.count()
+    if count == 0:
+        logger.info(f"LegalDocs index ({backend.name}) missing or empty. Starting Auto-Ingestion...")
+        status.set_state("ingesting")
+        ingest(status=status)
+        count = backend.count()
+        if count == 0:
+            status.set_state("unavailable", "No documents were ingested.")
+            return
+    else:
+        logger.info(f"LegalDocs index ({backend.name}) exists ({count} docs). Skipping ingestion.")
+    status.update(chunks=count)
+    status.set_state("ready")
+
 if __name__ == "__main__":
-    ingest()
\ No newline at end of file
+    import sys
+    ingest(full="--full" in sys.argv)
@@ -0,0 +1,128 @@
+import os
+import time
+import fnmatch
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+# Retention per artifact type, in days since last written (0 keeps forever)
+SESSION_RETENTION_DAYS = float(os.getenv("SESSION_RETENTION_DAYS", "90"))
+DRAFT_RETENTION_DAYS = float(os.getenv("DRAFT_RETENTION_DAYS", "7"))
+# Seconds between sweeps, and files looked at per step (one worker-thread hop each)
+JANITOR_INTERVAL = float(os.getenv("JANITOR_INTERVAL", "3600"))
+JANITOR_BATCH = int(os.getenv("JANITOR_BATCH", "500"))
+DAY = 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiredFiles:
+    """Retention target for files in one directory whose names match `patterns`, aged by modification time."""
+
+    def __init__(self, directory: str, patterns: Tuple[str, ...]):
+        self.directory = directory
+        self.patterns = patterns
+        self._scan = None
+
+    def _iter_matches(self):
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and any(fnmatch.fnmatch(entry.name, p) for p in self.patterns):
+                    yield entry
+
+    def purge_expired(self, cutoff: float, limit: int) -> dict:
+        """Same protocol as the session services: one resumable step of at most `limit` files."""
+        if self._scan is None:
+            if not os.path.isdir(self.directory):
+                return {"scanned": 0, "removed": 0, "bytes": 0, "done": True}
+            self._scan = self._iter_matches()
+        removed = freed = scanned = 0
+        for entry in self._scan:
+            scanned += 1
+            try:
+                stat = entry.stat()
+                if stat.st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+                    freed += stat.st_size
+            except FileNotFoundError:
+                pass  # Removed by someone else meanwhile
+            if scanned >= limit:
+                return {"scanned": scanned, "removed": removed, "bytes": freed, "done": False}
+        self._scan = None
+        return {"scanned": scanned, "removed": removed, "bytes": freed, "done": True}
+
+
+class Janitor:
+    """
+    Background garbage collection of expired artifacts.
+
+    Each target exposes `purge_expired(cutoff, limit)`, a resumable step that
+    examines at most `limit` items and deletes those older than `cutoff`. The
+    janitor runs the steps one at a time in a worker thread, so a sweep over
+    hundreds of thousands of files never blocks the event loop for longer
+    than a thread hop, and keeps a running report of what it reclaimed.
+    """
+
+    def __init__(self, targets: Dict[str, tuple], interval: float = JANITOR_INTERVAL, batch: int = JANITOR_BATCH):
+        # name -> (target, retention in seconds)
+        self.targets = targets
+        self.interval = interval
+        self.batch = batch
+        self.sweeps = 0
+        self.last_sweep: Optional[dict] = None
+        self.reclaimed = {name: {"removed": 0, "bytes": 0} for name in targets}
+
+    async def run(self) -> None:
+        """Sweeps every `interval` seconds until cancelled (lifespan task)."""
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Janitor sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self) -> dict:
+        started = time.time()
+        report = {}
+        for name, (target, retention) in self.targets.items():
+            if retention <= 0:
+                continue
+            cutoff = time.time() - retention
+            totals = {"scanned": 0, "removed": 0, "bytes": 0}
+            while True:
+                step = await asyncio.to_thread(target.purge_expired, cutoff, self.batch)
+                for key in totals:
+                    totals[key] += step[key]
+                if step["done"]:
+                    break
+            report[name] = totals
+            self.reclaimed[name]["removed"] += totals["removed"]
+            self.reclaimed[name]["bytes"] += totals["bytes"]
+        self.sweeps += 1
+        self.last_sweep = {"at": started, "duration": round(time.time() - started, 3), "targets": report}
+        if any(totals["removed"] for totals in report.values()):
+            summary = ", ".join(f"{name}: {t['removed']} ({t['bytes'] / 1024:.0f} KB)" for name, t in report.items())
+            logger.info(f"Janitor reclaimed {summary}")
+        return report
+
+    def stats(self) -> dict:
+        return {
+            "sweeps": self.sweeps,
+            "retention_days": {name: retention / DAY for name, (_, retention) in self.targets.items()},
+            "reclaimed": self.reclaimed,
+            "last_sweep": self.last_sweep,
+        }
+
+
+def build_janitor(session_service, output_dir: str, profile_dir: Optional[str] = None) -> Janitor:
+    """Janitor for the server's artifacts: stored sessions, generated drafts and request profiles."""
+    targets = {"drafts": (ExpiredFiles(output_dir, ("Draft_*.docx", "Draft_*.pdf")), DRAFT_RETENTION_DAYS * DAY)}
+    if profile_dir is not None:
+        from legal_agent.profiling import PROFILE_RETENTION_DAYS
+        targets["profiles"] = (ExpiredFiles(profile_dir, ("*.folded", "*.folded.tmp")), PROFILE_RETENTION_DAYS * DAY)
+    if hasattr(session_service, "purge_expired"):
+        targets["sessions"] = (session_service, SESSION_RETENTION_DAYS * DAY)
+    return Janitor(targets)
@@ -1,18 +1,87 @@
 import os
 import json
+import time
 import uuid
+import asyncio
+import logging
+import threading
 from typing import List, Optional, Dict
+from google.adk.events import Event
 from google.adk.sessions.base_session_service import BaseSessionService
 from google.adk.sessions.session import Session
 
+from legal_agent import session_codec, session_log
+from legal_agent.session_cache import SessionCache
+from legal_agent.session_layout import SESSION_SHARD_DEPTH, SessionLayout, is_session_id, split_name
+from legal_agent.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Write-behind bounds: a dirty session is written once it has been quiet for
+# SESSION_FLUSH_INTERVAL seconds, and never later than SESSION_FLUSH_MAX_DELAY
+# seconds after it first changed (the most a crash can lose). 0 writes through.
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "1.0"))
+SESSION_FLUSH_MAX_DELAY = float(os.getenv("SESSION_FLUSH_MAX_DELAY", "5.0"))
+# Appended events are folded into a fresh snapshot once the log holds this many
+SESSION_COMPACT_EVENTS = int(os.getenv("SESSION_COMPACT_EVENTS", "64"))
+
 class FileSessionService(BaseSessionService):
-    def __init__(self, storage_dir: str = "sessions"):
+    """
+    Sessions stored as a snapshot plus an append-only event log, written behind.
+
+    Updates only mark a session dirty; a background thread coalesces them and
+    persists each dirty session once per debounce window, so a turn with several
+    events costs one write and the event loop never waits on disk. A write
+    appends just the new events to `<id>.log` (see session_log.py), so a turn
+    costs the same however long the conversation is; every
+    `compact_events` events the log is folded into `<id>.snap`, which is
+    replaced atomically. Records can be compressed (see session_codec.py).
+    Legacy `<id>.json` files are still read and are converted on their next
+    write. Files are kept in hashed shard directories (see session_layout.py);
+    sessions from a flat directory are moved into place when first loaded.
+    `flush()` and `close()` write everything that is still pending.
+    """
+
+    def __init__(self, storage_dir: str = "sessions", flush_interval: float = SESSION_FLUSH_INTERVAL,
+                 max_delay: float = SESSION_FLUSH_MAX_DELAY, compact_events: int = SESSION_COMPACT_EVENTS,
+                 codec: Optional[session_codec.SessionCodec] = None, shard_depth: int = SESSION_SHARD_DEPTH):
         self.storage_dir = storage_dir
         os.makedirs(self.storage_dir, exist_ok=True)
-        self.cache: Dict[str, Session] = {}
+        self.layout = SessionLayout(storage_dir, shard_depth)
+        # Bounded LRU; sessions with unsaved changes are flushed before they can be evicted
+        self.cache = SessionCache(can_evict=self._can_evict, on_evict=self._evicted)
+        self.flush_interval = flush_interval
+        self.compact_events = compact_events
+        # Record compression for new writes (SESSION_CODEC); reads handle every codec
+        self.codec = codec or session_codec.get_codec()
+        # Per session on disk: events persisted, records in the log, intact log size
+        self._persisted: Dict[str, int] = {}
+        self._log_records: Dict[str, int] = {}
+        self._log_end: Dict[str, int] = {}
+        # Events before the first one held in memory (tail-only loads)
+        self._base: Dict[str, int] = {}
+        # Sessions whose state changed without an event (create/update_session)
+        self._needs_snapshot = set()
+        # Evicted sessions whose bookkeeping the flusher still has to drop
+        self._to_forget = set()
+        self.max_delay = max(max_delay, flush_interval)
+        # session_id -> (first_dirty, last_dirty) monotonic times
+        self._dirty: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        # Serializes file writes between the flusher thread and explicit flushes
+        # (reentrant: a write can trigger an eviction, which updates the bookkeeping)
+        self._io_lock = threading.RLock()
+        self._flusher = None
+        self._closed = False
+        # Position of the retention scan between purge_expired() calls
+        self._expiry_scan = None
+        self.writes = 0
+        self.compactions = 0
+        self.coalesced = 0
 
-    def _get_path(self, session_id: str) -> str:
-        return os.path.join(self.storage_dir, f"{session_id}.json")
+    def _get_path(self, session_id: str, ext: str = "snap", create: bool = False) -> str:
+        return self.layout.path(session_id, ext, create)
 
     async def create_session(self, app_name: str, user_id: str) -> str:
         session_id = str(uuid.uuid4())
@@ -25,63 +94,399 @@ class FileSessionService(BaseSessionService):
         await self.update_session(session)
         return session_id
 
-    async def get_session(self, app_name: str, user_id: str, session_id: str) -> Optional[Session]:
+    async def get_session(self, app_name: str, user_id: str, session_id: str, config=None) -> Optional[Session]:
+        """
+        Returns the session if `user_id` owns it; with `config.num_recent_events`
+        only that many of the latest events are read from disk (state is always
+        complete).
+        """
+        session = await self._get_session(session_id, getattr(config, "num_recent_events", None))
+        if session is None or session.app_name != app_name or session.user_id != user_id:
+            return None
+        return session
+
+    async def _get_session(self, session_id: str, tail: Optional[int]) -> Optional[Session]:
+        if not is_session_id(session_id):
+            return None  # Client-supplied id that this service never issued
         # 1. Check Cache
-        if session_id in self.cache:
-            return self.cache[session_id]
+        session = self.cache.get(session_id)
+        if session is not None and (tail is not None or not self._base.get(session_id)):
+            return session
+        if session is not None:
+            # A tail-only session is cached but full history was asked for
+            await self.flush()
 
         # 2. Check Disk
-        path = self._get_path(session_id)
-        if not os.path.exists(path):
-            return None
-        
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            # Deserialize
-            try:
-                session = Session.model_validate(data)
-            except AttributeError:
-                session = Session.parse_obj(data)
-            
-            # Update Cache
-            self.cache[session_id] = session
-            return session
+            loaded = await asyncio.to_thread(self._load, session_id, tail)
         except Exception as e:
-            print(f"Error loading session {session_id}: {e}")
+            logger.exception(f"Error loading session {session_id}: {e}")
+            return None
+        if loaded is None:
             return None
+        session, base, nbytes = loaded
+        self._base[session_id] = base
+        # Update Cache
+        self.cache.put(session_id, session, nbytes)
+        return session
+
+    @span("session_load")
+    def _load(self, session_id: str, tail: Optional[int] = None):
+        """Reads (session, events skipped, bytes read) from disk, or None if the session does not exist."""
+        snap_path = self._get_path(session_id)
+        with self._io_lock, self._lock:
+            # Being loaded again: keep the bookkeeping about to be set
+            self._to_forget.discard(session_id)
+        if not os.path.exists(snap_path):
+            with self._io_lock:
+                # A flat legacy .json moves into the shard without becoming a snapshot
+                self.layout.adopt(session_id)
+                if not os.path.exists(snap_path):
+                    return self._load_legacy(session_id)
+
+        with self._io_lock:
+            if tail is None:
+                records, _ = session_log.read_records(snap_path)
+                header, event_records = session_codec.loads(records[0]), records[1:]
+            else:
+                header, event_records = session_codec.loads(session_log.read_first_record(snap_path)), None
+            log_records, log_end = [], 0
+            log_path = self._get_path(session_id, "log")
+            if os.path.exists(log_path):
+                log_records, log_end = session_log.read_records(log_path)
+                if log_records and not session_log.is_current(log_path):
+                    self._needs_snapshot.add(session_id)  # Fold a v1 log before appending
+            count = header.pop("event_count")
+            # Events appended after the snapshot (seq below count were folded into it already)
+            appended = []
+            for record in log_records:
+                entry = session_codec.loads(record)
+                if entry["seq"] == count + len(appended):
+                    appended.append(entry["event"])
+            if event_records is None:
+                # Tail-only: read just the snapshot events the log does not cover, from the end
+                needed = min(count, max(tail - len(appended), 0))
+                event_records = session_log.read_last_records(snap_path, needed) if needed else []
+
+        session = Session.model_validate({**header, "events": []})
+        session.events = [Event.model_validate_json(r) for r in event_records]
+        # Replay the log with its state deltas
+        for data in appended:
+            event = Event.model_validate(data)
+            self._update_session_state(session, event)
+            session.events.append(event)
+            session.last_update_time = event.timestamp
+        total = count + len(appended)
+        nbytes = sum(len(r) for r in event_records) + sum(len(r) for r in log_records)
+        if tail is not None:
+            session.events = session.events[-tail:] if tail else []
+        self._persisted[session_id] = total
+        self._log_records[session_id] = len(log_records)
+        self._log_end[session_id] = log_end
+        return session, total - len(session.events), nbytes
+
+    def _load_legacy(self, session_id: str):
+        path = self._get_path(session_id, "json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+            nbytes = f.tell()
+        # Deserialize
+        try:
+            session = Session.model_validate(data)
+        except AttributeError:
+            session = Session.parse_obj(data)
+        # Rewritten in the snapshot format on the next write
+        self._needs_snapshot.add(session_id)
+        return session, 0, nbytes
 
     async def update_session(self, session: Session) -> None:
-        print(f"DEBUG: Updating session {session.id} (Events: {len(session.events)})")
         # Update Cache
-        self.cache[session.id] = session
-        # Write to Disk
+        self.cache.put(session.id, session)
+        self._needs_snapshot.add(session.id)
         await self.save_session(session.id)
 
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        if not event.partial:
+            self._mark_dirty(session.id)
+            self.cache.put(session.id, session)
+        return event
+
     async def save_session(self, session_id: str) -> None:
-        """Explicitly write cached session to disk."""
+        """Schedules a cached session for writing (immediately if write-behind is off)."""
         if session_id not in self.cache:
             return
-        
-        session = self.cache[session_id]
-        print(f"DEBUG: Persisting session {session.id} to disk.")
-        path = self._get_path(session.id)
-        with open(path, "w", encoding="utf-8") as f:
-            try:
-                f.write(session.model_dump_json())
-            except AttributeError:
-                f.write(session.json())
+        if self.flush_interval <= 0:
+            await asyncio.to_thread(self._write, session_id)
+        else:
+            self._mark_dirty(session_id)
+
+    def _mark_dirty(self, session_id: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            first, _ = self._dirty.get(session_id, (now, now))
+            if session_id in self._dirty:
+                self.coalesced += 1
+            self._dirty[session_id] = (first, now)
+            self._start_flusher()
+            self._wake.notify()
+
+    def _start_flusher(self) -> None:
+        # Called with self._lock held
+        if self._flusher is None and not self._closed:
+            self._flusher = threading.Thread(target=self._flush_loop, name="session-flusher", daemon=True)
+            self._flusher.start()
+
+    def _can_evict(self, session_id: str) -> bool:
+        """Cache guard: a dirty session is flushed right away instead of being evicted."""
+        with self._lock:
+            if session_id not in self._dirty:
+                return True
+            self._dirty[session_id] = (0.0, 0.0)
+            self._wake.notify()
+            return False
+
+    def _evicted(self, session_id: str) -> None:
+        """
+        Cache eviction callback, often on the event loop: only queues the cleanup
+        for the flusher, since _forget needs the I/O lock that writes hold.
+        """
+        with self._lock:
+            self._to_forget.add(session_id)
+            self._start_flusher()
+            self._wake.notify()
+
+    def _forget_evicted(self) -> None:
+        with self._io_lock:
+            with self._lock:
+                evicted, self._to_forget = self._to_forget, set()
+            for session_id in evicted:
+                if session_id not in self.cache:
+                    self._forget(session_id)
+
+    def _forget(self, session_id: str) -> None:
+        """Drops the on-disk bookkeeping of an evicted session; it is re-read on the next load."""
+        with self._io_lock:
+            if self._base.get(session_id):
+                return  # Tail-only session: keep the offset in case it is still being appended to
+            for state in (self._persisted, self._log_records, self._log_end, self._base):
+                state.pop(session_id, None)
+            self._needs_snapshot.discard(session_id)
+
+    def _flush_loop(self) -> None:
+        with self._lock:
+            while not self._closed:
+                now = time.monotonic()
+                due, wait = [], None
+                for session_id, stamp in self._dirty.items():
+                    first, last = stamp
+                    ready_at = min(last + self.flush_interval, first + self.max_delay)
+                    if ready_at <= now:
+                        due.append((session_id, stamp))
+                    else:
+                        wait = ready_at - now if wait is None else min(wait, ready_at - now)
+                if not due and not self._to_forget:
+                    self._wake.wait(timeout=wait)
+                    continue
+                self._lock.release()
+                try:
+                    self._write_all(due)
+                finally:
+                    self._lock.acquire()
+
+    def _write_all(self, due: list) -> None:
+        """
+        Writes (session_id, dirty stamp) pairs. A session stays marked dirty until
+        it is on disk (so it cannot be evicted mid-write), and stays dirty if it
+        changed again meanwhile.
+        """
+        for session_id, stamp in due:
+            self._write(session_id)
+            with self._lock:
+                if self._dirty.get(session_id) == stamp:
+                    del self._dirty[session_id]
+        self.cache.trim()
+        self._forget_evicted()
+
+    @span("session_write")
+    def _write(self, session_id: str) -> None:
+        session = self.cache.peek(session_id)
+        if session is None:
+            return
+        try:
+            with self._io_lock:
+                persisted = self._persisted.get(session_id)
+                base = self._base.get(session_id, 0)
+                if (persisted is None or session_id in self._needs_snapshot
+                        or not base <= persisted <= base + len(session.events)):
+                    self._compact(session_id, session, base)
+                else:
+                    new = session.events[persisted - base:]
+                    if not new:
+                        return
+                    if self._log_records.get(session_id, 0) + len(new) > self.compact_events:
+                        self._compact(session_id, session, base)
+                    else:
+                        self._append(session_id, new, persisted)
+                self.writes += 1
+        except Exception as e:
+            logger.exception(f"Error persisting session {session_id}: {e}")
+            # Keep it dirty; the next flush retries
+            self._mark_dirty(session_id)
+
+    def _append(self, session_id: str, events: List[Event], first_seq: int) -> None:
+        """Appends `events` to the session's log, O(new events) regardless of history length."""
+        payloads = [
+            b'{"seq":%d,"event":%s}' % (first_seq + i, event.model_dump_json(exclude_none=True).encode("utf-8"))
+            for i, event in enumerate(events)
+        ]
+        self._log_end[session_id] = session_log.append_records(
+            self._get_path(session_id, "log"), payloads, self.codec, self._log_end.get(session_id, 0)
+        )
+        self.cache.add_bytes(session_id, sum(len(p) for p in payloads))
+        self._persisted[session_id] = first_seq + len(events)
+        self._log_records[session_id] = self._log_records.get(session_id, 0) + len(events)
+
+    @span("session_compact")
+    def _compact(self, session_id: str, session: Session, base: int) -> None:
+        """Folds the whole session into a new snapshot (atomic rename), then drops the log."""
+        events = list(session.events)
+        if base:
+            # Tail-only session in memory: take the older events from disk
+            snap_records, _ = session_log.read_records(self._get_path(session_id))
+            older = [Event.model_validate_json(r) for r in snap_records[1:]]
+            log_path = self._get_path(session_id, "log")
+            if os.path.exists(log_path):
+                for record in session_log.read_records(log_path)[0]:
+                    entry = session_codec.loads(record)
+                    if entry["seq"] == len(older):
+                        older.append(Event.model_validate(entry["event"]))
+            events = older[:base] + events
+        header = session.model_dump(mode="json", exclude={"events"})
+        header["event_count"] = len(events)
+        payloads = [session_codec.dumps(header)]
+        payloads.extend(event.model_dump_json(exclude_none=True).encode("utf-8") for event in events)
+        session_log.write_atomic(self._get_path(session_id, create=True), payloads, self.codec)
+        self.cache.set_bytes(session_id, sum(len(p) for p in payloads))
+        # The snapshot holds every event now; a log left by a crash right here is skipped by seq
+        for ext in ("log", "json"):
+            path = self._get_path(session_id, ext)
+            if os.path.exists(path):
+                os.remove(path)
+        self._needs_snapshot.discard(session_id)
+        self._persisted[session_id] = len(events)
+        self._log_records[session_id] = 0
+        self._log_end[session_id] = 0
+        self.compactions += 1
+
+    def flush_now(self) -> None:
+        """Writes every dirty session (blocking)."""
+        with self._lock:
+            pending = list(self._dirty.items())
+        self._write_all(pending)
+
+    async def flush(self) -> None:
+        await asyncio.to_thread(self.flush_now)
+
+    async def close(self) -> None:
+        """Stops the flusher and writes whatever is still dirty (graceful shutdown)."""
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+        if self._flusher is not None:
+            await asyncio.to_thread(self._flusher.join)
+        await self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            persistence = {"dirty": len(self._dirty), "writes": self.writes,
+                           "compactions": self.compactions, "coalesced": self.coalesced}
+        return {**persistence, "cache": self.cache.stats()}
 
     async def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
-        path = self._get_path(session_id)
-        if os.path.exists(path):
-            os.remove(path)
+        if not is_session_id(session_id):
+            return
+        with self._lock:
+            self._dirty.pop(session_id, None)
+        self.cache.pop(session_id)
+        self._remove(session_id)
+
+    def _remove(self, session_id: str) -> int:
+        """Deletes a session's files and bookkeeping. Returns the bytes freed."""
+        freed = 0
+        with self._io_lock:
+            self.layout.adopt(session_id)
+            for state in (self._persisted, self._log_records, self._log_end, self._base):
+                state.pop(session_id, None)
+            self._needs_snapshot.discard(session_id)
+            for ext in ("snap", "log", "json"):
+                path = self._get_path(session_id, ext)
+                if os.path.exists(path):
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+        return freed
+
+    def purge_expired(self, cutoff: float, limit: int) -> dict:
+        """
+        One step of the retention scan (see janitor.py): looks at up to `limit`
+        stored files and deletes the sessions last written before `cutoff`
+        (epoch seconds). The scan resumes where the previous call stopped;
+        `done` is set when it has covered every shard.
+        """
+        if self._expiry_scan is None:
+            self._expiry_scan = self.layout.iter_files()
+        removed = freed = scanned = 0
+        for entry in self._expiry_scan:
+            scanned += 1
+            session_id, ext = split_name(entry.name)
+            directory = os.path.dirname(entry.path)
+            if not is_session_id(session_id):
+                mtime = None  # Not ours to delete
+            elif ext == ".snap":
+                log_path = os.path.join(directory, f"{session_id}.log")
+                mtime = max(entry.stat().st_mtime, os.path.getmtime(log_path) if os.path.exists(log_path) else 0)
+            elif ext == ".json" and not os.path.exists(os.path.join(directory, f"{session_id}.snap")):
+                mtime = entry.stat().st_mtime
+            else:
+                mtime = None
+            if mtime is not None and mtime < cutoff:
+                with self._lock:
+                    dirty = session_id in self._dirty
+                # A cached session may have changed since its files were written
+                cached = self.cache.peek(session_id)
+                if not dirty and (cached is None or cached.last_update_time < cutoff):
+                    self.cache.pop(session_id)
+                    freed += self._remove(session_id)
+                    removed += 1
+            if scanned >= limit:
+                return {"scanned": scanned, "removed": removed, "bytes": freed, "done": False}
+        self._expiry_scan = None
+        return {"scanned": scanned, "removed": removed, "bytes": freed, "done": True}
 
     async def list_sessions(self, app_name: str, user_id: str) -> List[str]:
-        sessions = []
-        for filename in os.listdir(self.storage_dir):
-            if filename.endswith(".json"):
-                 # Optional: Filter by user_id if we loaded the content, 
-                 # but for simple listing we just return IDs.
-                 sessions.append(filename[:-5])
-        return sessions
+        # Optional: Filter by user_id if we loaded the content,
+        # but for simple listing we just return IDs.
+        return sorted(await asyncio.to_thread(lambda: list(self.layout.iter_session_ids())))
+
+    def load_session(self, session_id: str) -> Optional[Session]:
+        """Reads a whole session from disk without caching it (maintenance tools)."""
+        if not is_session_id(session_id):
+            return None
+        with self._io_lock:
+            loaded = self._load(session_id)
+            self._forget(session_id)
+        return loaded[0] if loaded is not None else None
+
+    def compact_session(self, session_id: str) -> bool:
+        """Folds a stored session's log (or legacy .json file) into a fresh snapshot."""
+        if not is_session_id(session_id):
+            return False
+        with self._io_lock:
+            loaded = self._load(session_id)
+            if loaded is None:
+                return False
+            self._compact(session_id, loaded[0], 0)
+            self._forget(session_id)
+        return True
@@ -0,0 +1,141 @@
+import os
+import re
+import sys
+import hmac
+import time
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# Profiling a chat turn (X-Profile / ?profile=1 on /chat) needs this token; unset disables it
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Seconds between stack samples (200 Hz)
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+# Profiles kept, in days since written (the janitor deletes older ones; 0 keeps forever)
+PROFILE_RETENTION_DAYS = float(os.getenv("PROFILE_RETENTION_DAYS", "7"))
+
+# Leaf frames in these stdlib modules are threads waiting for work (the loop's
+# select, idle pool workers), not time spent on the request
+IDLE_MODULES = ("selectors.py", "threading.py", "queue.py", "futures/thread.py")
+_PROFILE_NAME = re.compile(r"^([A-Za-z0-9-]+)_(\d{8}T\d{6}Z)_([A-Za-z0-9.:-]+)\.folded$")
+_UNSAFE = re.compile(r"[^A-Za-z0-9-]")
+
+
+def check_admin_token(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler: a background thread snapshots every
+    thread's Python stack each `interval` seconds and counts identical
+    stacks, in the folded format flame graph tools read (flamegraph.pl,
+    speedscope, inferno). Costs nothing for requests that are not profiled.
+
+    It sees the whole process: turns of other sessions running on the same
+    event loop in the meantime show up too. Each stack starts with its
+    thread's name, so the event loop and the tool threads can be told apart.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.started = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self._sample(names.get(ident, str(ident)), frame)
+            self.samples += 1
+
+    def _sample(self, thread_name: str, frame) -> None:
+        if frame.f_code.co_filename.endswith(IDLE_MODULES):
+            return
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        labels.append(f"thread:{thread_name}")
+        key = ";".join(reversed(labels))
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def folded(self) -> str:
+        """One 'frame;frame;... count' line per distinct stack, most frequent first."""
+        lines = sorted(self.stacks.items(), key=lambda item: -item[1])
+        return "".join(f"{stack} {count}\n" for stack, count in lines)
+
+
+class ProfileStore:
+    """Folded profiles in one directory, named '<session id>_<UTC time>_<request id>.folded'."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def save(self, session_id: str, request_id: str, profiler: SamplingProfiler) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        name = f"{_UNSAFE.sub('', session_id)}_{stamp}_{request_id}.folded"
+        tmp_path = os.path.join(self.directory, name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(profiler.folded())
+        os.replace(tmp_path, os.path.join(self.directory, name))
+        return name
+
+    def path(self, name: str) -> Optional[str]:
+        """Path of a stored profile, or None (unknown or malformed name; never outside the directory)."""
+        if not _PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def list(self, limit: int = 50, session_id: Optional[str] = None) -> List[dict]:
+        """Most recent profiles first."""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                match = _PROFILE_NAME.match(entry.name)
+                if not match or (session_id is not None and match.group(1) != session_id):
+                    continue
+                stat = entry.stat()
+                profiles.append({
+                    "name": entry.name,
+                    "session_id": match.group(1),
+                    "request_id": match.group(3),
+                    "created": stat.st_mtime,
+                    "bytes": stat.st_size,
+                })
+        profiles.sort(key=lambda p: -p["created"])
+        return profiles[:limit]
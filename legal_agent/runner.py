@@ -1,14 +1,101 @@
-from typing import Optional
+from typing import AsyncIterator, List, Optional
 import os
+import re
+import asyncio
 import logging
+from contextlib import aclosing
 from google.adk import Runner
+from google.adk.agents.run_config import RunConfig, StreamingMode, ToolThreadPoolConfig
+from google.adk.apps import App
+from google.adk.events import Event
 from google.adk.sessions.base_session_service import BaseSessionService
 from google.genai import types
 
 from legal_agent.agent import get_agent  # Import the factory function
+from legal_agent import telemetry
+from legal_agent.logs import SAMPLED
 
 logger = logging.getLogger(__name__)
 
+# Deadline for one chat turn, all LLM and tool calls included (0 disables)
+CHAT_TIMEOUT = float(os.getenv("CHAT_TIMEOUT", "300"))
+# Worker threads for the synchronous tools (web search, document generation),
+# which would otherwise run on the event loop
+AGENT_TOOL_THREADS = int(os.getenv("AGENT_TOOL_THREADS", "8"))
+# Events buffered between the agent and a slow streaming client
+STREAM_BUFFER = int(os.getenv("STREAM_BUFFER", "256"))
+
+
+def log_event(session_id: str, event: Event) -> None:
+    """Sampled debug summary of one agent event (never the full repr, which can be megabytes)."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    parts = event.content.parts if event.content and event.content.parts else []
+    logger.debug(
+        "Agent event", extra={
+            **SAMPLED,
+            "session_id": session_id,
+            "author": event.author,
+            "partial": bool(event.partial),
+            "text_chars": sum(len(p.text) for p in parts if p.text),
+            "calls": [p.function_call.name for p in parts if p.function_call],
+            "responses": [p.function_response.name for p in parts if p.function_response],
+        },
+    )
+
+
+def find_generated_file(text: str) -> Optional[str]:
+    """Name of a document the agent generated, from a tool result or the answer text."""
+    # Explicit path check
+    path_match = re.search(r'created at:\s*(.*?\.docx)', text, re.IGNORECASE)
+    if path_match:
+        return os.path.basename(path_match.group(1).strip())
+    # Regex Draft Check
+    draft_match = re.search(r'Draft_[a-zA-Z0-9_-]+\.(docx|pdf)', text)
+    if draft_match:
+        return draft_match.group(0)
+    return None
+
+
+class TurnStream:
+    """
+    Turns the ADK events of one chat turn into messages for streaming clients:
+
+    - {"type": "text", "text": ...}            model text, as it is generated
+    - {"type": "tool_start", "name", "args"}   the model called a tool
+    - {"type": "tool_end", "name"}             the tool returned
+    - {"type": "file", "filename"}             a tool generated a document
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.filename = None
+        self._streamed = False
+
+    def feed(self, event: Event) -> List[dict]:
+        messages = []
+        parts = event.content.parts if event.content and event.content.parts else []
+        for part in parts:
+            if part.text and not part.thought:
+                # Partial events carry the text as it streams; the final event repeats all of it
+                if event.partial or not self._streamed:
+                    self.text += part.text
+                    messages.append({"type": "text", "text": part.text})
+            elif event.partial:
+                continue  # Function call arguments still streaming in
+            elif part.function_call:
+                messages.append({"type": "tool_start", "name": part.function_call.name,
+                                 "args": dict(part.function_call.args or {})})
+            elif part.function_response:
+                messages.append({"type": "tool_end", "name": part.function_response.name})
+                filename = find_generated_file(str(part.function_response.response or ""))
+                if filename:
+                    self.filename = filename
+                    messages.append({"type": "file", "filename": filename})
+        self._streamed = bool(event.partial)
+        return messages
+
+
 class LegalAgentRunner:
     """
     Singleton wrapper for the ADK Runner to ensure persistent execution logic.
@@ -17,10 +104,13 @@ class LegalAgentRunner:
     
     def __init__(self, session_service: BaseSessionService):
         self.runner = Runner(
-            agent=get_agent(),
-            app_name="legal_agent",
+            # The telemetry plugin times every LLM and tool call (see /metrics)
+            app=App(name="legal_agent", root_agent=get_agent(), plugins=[telemetry.TelemetryPlugin()]),
             session_service=session_service
         )
+        self.run_config = RunConfig(tool_thread_pool_config=ToolThreadPoolConfig(max_workers=AGENT_TOOL_THREADS))
+        # Streaming turns ask the model for partial responses (token by token)
+        self.stream_config = self.run_config.model_copy(update={"streaming_mode": StreamingMode.SSE})
         logger.info("LegalAgentRunner initialized with persistent Runner.")
 
     @classmethod
@@ -31,40 +121,114 @@ class LegalAgentRunner:
             cls._instance = cls(session_service)
         return cls._instance
 
-    async def run_chat(self, session_id: str, user_message: str, user_id: str = "default_user") -> str:
+    async def run_chat(self, session_id: str, user_message: str, user_id: str = "default_user",
+                       timeout: Optional[float] = CHAT_TIMEOUT) -> str:
         """
-        Executes the agent for a given session and message using proper ADK Runner lifecycle.
+        Executes the agent for a given session and message on the caller's event
+        loop, so concurrent chats interleave while they wait on the LLM or tools.
+        Raises asyncio.TimeoutError after `timeout` seconds; cancelling the
+        calling task (e.g. on client disconnect) stops the turn as well.
         """
         logger.info(f"Runner executing for session {session_id}")
-        
+
         # Create the user content object
         user_content = types.Content(
             role="user",
             parts=[types.Part(text=user_message)]
         )
 
-        final_text = ""
-        
         try:
-            # Use the runner's run method which handles event loop and state management
-            # Note: Runner.run is a synchronous generator in this version of ADK
-            for event in self.runner.run(session_id=session_id, user_id=user_id, new_message=user_content):
-                logger.info(f"DEBUG Event type: {type(event)} Content: {event}")
-                print(f"DEBUG Event: {event}")
-                
-                # Check for standard ModelResponse event from ADK which contains the text
-                if hasattr(event, "content") and event.content and event.content.parts:
-                     text_part = ''.join(p.text for p in event.content.parts if p.text)
-                     print(f"DEBUG Chunk: {text_part}")
-                     final_text += text_part
+            with telemetry.turn("chat") as trace:
+                try:
+                    return await asyncio.wait_for(self._run_turn(session_id, user_id, user_content), timeout or None)
+                finally:
+                    logger.info(f"Turn breakdown for session {session_id}: {trace.breakdown()}")
+        except asyncio.TimeoutError:
+            logger.error(f"Agent turn for session {session_id} timed out after {timeout:g}s")
+            raise
+        except asyncio.CancelledError:
+            logger.info(f"Agent turn for session {session_id} cancelled")
+            raise
         except Exception as e:
-            logger.error(f"Error during agent execution: {e}")
-            print(f"CRITICAL RUNNER ERROR: {e}")
+            logger.exception(f"Error during agent execution: {e}")
             raise e
-        
-        # Explicitly save session state to disk
-        # (Assuming the session service is our custom FileSessionService)
-        if hasattr(self.runner.session_service, "save_session"):
-            await self.runner.session_service.save_session(session_id)
-                
+        finally:
+            # Mark the turn's session for the write-behind flusher, including the
+            # events of a turn that was cut short
+            # (Assuming the session service is our custom FileSessionService)
+            if hasattr(self.runner.session_service, "save_session"):
+                await self.runner.session_service.save_session(session_id)
+
+    async def _run_turn(self, session_id: str, user_id: str, user_content: types.Content) -> str:
+        final_text = ""
+        events = self.runner.run_async(
+            session_id=session_id, user_id=user_id, new_message=user_content, run_config=self.run_config
+        )
+        # aclosing: a cancelled turn closes the generator (and the LLM call it is waiting on) right away
+        async with aclosing(events):
+            async for event in events:
+                log_event(session_id, event)
+
+                # Check for standard ModelResponse event from ADK which contains the text
+                if hasattr(event, "content") and event.content and event.content.parts:
+                    text_part = ''.join(p.text for p in event.content.parts if p.text)
+                    final_text += text_part
         return final_text
+
+    async def stream_chat(self, session_id: str, user_message: str, user_id: str = "default_user",
+                          timeout: Optional[float] = CHAT_TIMEOUT) -> AsyncIterator[dict]:
+        """
+        Runs a turn like `run_chat`, yielding TurnStream messages as the agent
+        produces them and a final {"type": "done", "response", "filename"}.
+        Raises asyncio.TimeoutError after `timeout` seconds; closing the
+        iterator (client gone) cancels the turn.
+        """
+        logger.info(f"Runner streaming for session {session_id}")
+        user_content = types.Content(role="user", parts=[types.Part(text=user_message)])
+        # The agent runs in its own task, so the deadline also applies while it waits on the client
+        queue = asyncio.Queue(maxsize=STREAM_BUFFER)
+        finished = object()
+
+        async def produce():
+            try:
+                events = self.runner.run_async(
+                    session_id=session_id, user_id=user_id, new_message=user_content, run_config=self.stream_config
+                )
+                async with aclosing(events):
+                    async for event in events:
+                        await queue.put(event)
+            except Exception as e:
+                await queue.put(e)
+            else:
+                await queue.put(finished)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout else None
+        stream = TurnStream()
+        try:
+            with telemetry.turn("stream") as trace:
+                # Created inside the trace, so the agent's spans are attributed to this turn
+                producer = asyncio.create_task(produce())
+                try:
+                    while True:
+                        item = await asyncio.wait_for(queue.get(), None if deadline is None else deadline - loop.time())
+                        if item is finished:
+                            break
+                        if isinstance(item, Exception):
+                            logger.error(f"Error during agent execution: {item}")
+                            raise item
+                        log_event(session_id, item)
+                        for message in stream.feed(item):
+                            yield message
+                    yield {"type": "done", "response": stream.text,
+                           "filename": stream.filename or find_generated_file(stream.text)}
+                except asyncio.TimeoutError:
+                    logger.error(f"Agent turn for session {session_id} timed out after {timeout:g}s")
+                    raise
+                finally:
+                    producer.cancel()
+                    await asyncio.wait({producer})
+                    logger.info(f"Turn breakdown for session {session_id}: {trace.breakdown()}")
+        finally:
+            if hasattr(self.runner.session_service, "save_session"):
+                await self.runner.session_service.save_session(session_id)
@@ -0,0 +1,132 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from google.adk.sessions.session import Session
+
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "256"))
+SESSION_CACHE_MB = float(os.getenv("SESSION_CACHE_MB", "64"))
+
+
+class SessionCache:
+    """
+    Bounded LRU cache of loaded sessions, limited by entry count and by
+    estimated size (the serialized bytes of each session, as last read or
+    written).
+
+    `can_evict(session_id)` guards eviction: the session service refuses
+    sessions with unsaved changes and expedites their flush instead, then
+    calls `trim()` once they are on disk. `on_evict(session_id)` is called for
+    every evicted session, outside the lock.
+    """
+
+    def __init__(self, max_entries: int = SESSION_CACHE_SIZE, max_bytes: int = int(SESSION_CACHE_MB * 1024 * 1024),
+                 can_evict: Optional[Callable[[str], bool]] = None,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._can_evict = can_evict or (lambda session_id: True)
+        self._on_evict = on_evict
+        self._entries: "OrderedDict[str, list]" = OrderedDict()  # id -> [session, nbytes]
+        self._lock = threading.Lock()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """Lookup that counts towards the hit rate and refreshes recency."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, session_id: str) -> Optional[Session]:
+        """Lookup for internal use (writes): no stats, no recency change."""
+        entry = self._entries.get(session_id)
+        return entry[0] if entry is not None else None
+
+    def put(self, session_id: str, session: Session, nbytes: Optional[int] = None) -> None:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                entry = self._entries[session_id] = [session, 0]
+            entry[0] = session
+            self._entries.move_to_end(session_id)
+            if nbytes is not None:
+                self.resident_bytes += nbytes - entry[1]
+                entry[1] = nbytes
+        self.trim()
+
+    def add_bytes(self, session_id: str, delta: int) -> None:
+        """Accounts for events appended to a cached session since its size was last set."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry[1] += delta
+                self.resident_bytes += delta
+        self.trim()
+
+    def set_bytes(self, session_id: str, nbytes: int) -> None:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                self.resident_bytes += nbytes - entry[1]
+                entry[1] = nbytes
+        self.trim()
+
+    def pop(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            if entry is None:
+                return None
+            self.resident_bytes -= entry[1]
+            return entry[0]
+
+    def trim(self) -> List[str]:
+        """Evicts least recently used sessions until both limits hold; returns their ids."""
+        evicted = []
+        with self._lock:
+            for session_id in list(self._entries):
+                if len(self._entries) <= self.max_entries and self.resident_bytes <= self.max_bytes:
+                    break
+                # Most recently used entry stays even if it alone exceeds max_bytes
+                if session_id == next(reversed(self._entries)):
+                    break
+                if not self._can_evict(session_id):
+                    continue
+                _, nbytes = self._entries.pop(session_id)
+                self.resident_bytes -= nbytes
+                self.evictions += 1
+                evicted.append(session_id)
+        if self._on_evict is not None:
+            for session_id in evicted:
+                self._on_evict(session_id)
+        return evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.resident_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
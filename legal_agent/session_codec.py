@@ -0,0 +1,81 @@
+import os
+import json
+import zlib
+
+# Optional accelerators: orjson for the JSON glue around events, zstandard for
+# compression. Without them the codec falls back to json and zlib (gzip's deflate).
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# First byte of every stored record says how the rest is encoded
+RAW = b"\x00"
+ZSTD = b"\x01"
+DEFLATE = b"\x02"
+
+# Small records (user messages, function calls) do not shrink enough to be worth it
+MIN_COMPRESS_SIZE = int(os.getenv("SESSION_COMPRESS_MIN_BYTES", "512"))
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class SessionCodec:
+    """
+    Encodes record payloads for session files: "none" stores them as is,
+    "zstd" and "gzip" compress records larger than MIN_COMPRESS_SIZE (tool
+    responses with retrieved Act text compress several times over). Decoding
+    follows each record's own tag, so files written with any codec stay
+    readable after SESSION_CODEC changes.
+    """
+
+    def __init__(self, name: str = "none", level: int = 3):
+        if name == "auto":
+            name = "zstd" if zstandard is not None else "gzip"
+        if name == "zstd" and zstandard is None:
+            raise ValueError("SESSION_CODEC=zstd needs the 'zstandard' package.")
+        if name not in ("none", "zstd", "gzip"):
+            raise ValueError(f"Unknown SESSION_CODEC '{name}' (expected none, zstd, gzip or auto).")
+        self.name = name
+        self.level = level
+        self._compressor = zstandard.ZstdCompressor(level=level) if name == "zstd" else None
+        self._decompressor = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+    def encode(self, payload: bytes) -> bytes:
+        if self.name == "none" or len(payload) < MIN_COMPRESS_SIZE:
+            return RAW + payload
+        if self._compressor is not None:
+            return ZSTD + self._compressor.compress(payload)
+        return DEFLATE + zlib.compress(payload, self.level)
+
+    def decode(self, data: bytes) -> bytes:
+        tag, body = data[:1], data[1:]
+        if tag == RAW:
+            return body
+        if tag == ZSTD:
+            if self._decompressor is None:
+                raise ValueError("Session record is zstd-compressed but 'zstandard' is not installed.")
+            return self._decompressor.decompress(body)
+        if tag == DEFLATE:
+            return zlib.decompress(body)
+        raise ValueError(f"Unknown session record encoding {tag!r}.")
+
+
+def get_codec() -> SessionCodec:
+    """Codec selected by SESSION_CODEC (none, zstd, gzip or auto)."""
+    return SessionCodec(os.getenv("SESSION_CODEC", "none").lower(), int(os.getenv("SESSION_CODEC_LEVEL", "3")))
@@ -0,0 +1,103 @@
+import os
+import re
+import hashlib
+from typing import Iterator, Tuple
+
+# Sessions are spread over nested shard directories named after a hash of the
+# session id (2 hex characters per level, 256 directories each), so no single
+# directory grows with the number of sessions. 0 keeps the flat layout.
+SESSION_SHARD_DEPTH = int(os.getenv("SESSION_SHARD_DEPTH", "2"))
+SHARD_WIDTH = 2
+
+# Files that belong to a session (see persistence.py); ".tmp" is an
+# interrupted atomic write
+SESSION_EXTS = (".snap", ".log", ".json")
+
+# Session ids are server-generated UUIDs; anything else never becomes a path
+_SESSION_ID = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def is_session_id(session_id) -> bool:
+    return isinstance(session_id, str) and bool(_SESSION_ID.match(session_id))
+
+
+def split_name(filename: str) -> Tuple[str, str]:
+    """'<id>.snap' -> ('<id>', '.snap'); '<id>.snap.tmp' -> ('<id>', '.tmp')."""
+    if filename.endswith(".tmp"):
+        return os.path.splitext(filename[:-len(".tmp")])[0], ".tmp"
+    return os.path.splitext(filename)
+
+
+def _is_shard_name(name: str) -> bool:
+    return len(name) == SHARD_WIDTH and all(c in "0123456789abcdef" for c in name)
+
+
+class SessionLayout:
+    """Where a session's files live under `root`, and streaming walks over all of them."""
+
+    def __init__(self, root: str, depth: int = SESSION_SHARD_DEPTH):
+        self.root = root
+        self.depth = depth
+        # Flat files left from before sharding are moved into place when first touched
+        self.has_flat = depth > 0 and any(True for _ in self.iter_entries(root))
+
+    def shard(self, session_id: str) -> str:
+        if self.depth <= 0:
+            return self.root
+        digest = hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).hexdigest()
+        parts = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(self.depth)]
+        return os.path.join(self.root, *parts)
+
+    def path(self, session_id: str, ext: str = "snap", create: bool = False) -> str:
+        if not is_session_id(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        directory = self.shard(session_id)
+        if create:
+            os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{session_id}.{ext}")
+
+    def adopt(self, session_id: str) -> bool:
+        """Moves a session's files from the flat root into its shard. Returns whether any moved."""
+        if not self.has_flat or not is_session_id(session_id):
+            return False
+        moved = False
+        for ext in SESSION_EXTS:
+            flat = os.path.join(self.root, f"{session_id}{ext}")
+            if os.path.exists(flat):
+                os.replace(flat, self.path(session_id, ext[1:], create=True))
+                moved = True
+        return moved
+
+    @staticmethod
+    def iter_entries(directory: str) -> Iterator[os.DirEntry]:
+        """Session files directly in `directory`."""
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and split_name(entry.name)[1] in SESSION_EXTS + (".tmp",):
+                    yield entry
+
+    def iter_dirs(self, directory: str = None, level: int = 0) -> Iterator[Tuple[str, int]]:
+        """(directory, level) for the root and every shard directory below it, depth first."""
+        directory = directory or self.root
+        yield directory, level
+        with os.scandir(directory) as entries:
+            subdirs = [e.path for e in entries if e.is_dir() and _is_shard_name(e.name)]
+        for subdir in sorted(subdirs):
+            yield from self.iter_dirs(subdir, level + 1)
+
+    def iter_files(self) -> Iterator[os.DirEntry]:
+        """Every session file under the root, whatever layout it was written with, one directory at a time."""
+        for directory, _ in self.iter_dirs():
+            yield from self.iter_entries(directory)
+
+    def iter_session_ids(self) -> Iterator[str]:
+        """Ids of stored sessions (those with a snapshot, or a legacy .json file only)."""
+        for entry in self.iter_files():
+            session_id, ext = split_name(entry.name)
+            if not is_session_id(session_id):
+                continue
+            if ext == ".snap":
+                yield session_id
+            elif ext == ".json":
+                if not os.path.exists(os.path.join(os.path.dirname(entry.path), f"{session_id}.snap")):
+                    yield session_id
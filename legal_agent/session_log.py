@@ -0,0 +1,113 @@
+import os
+import struct
+from typing import Iterable, List, Optional, Tuple
+
+from legal_agent.session_codec import SessionCodec
+
+# On-disk format of a session (see FileSessionService):
+#
+#   <id>.snap  MAGIC, header record, one record per event   (rewritten atomically)
+#   <id>.log   MAGIC, one record per event appended since    (append-only)
+#
+# A record is <u32 length><payload><u32 length>. The trailing length lets the
+# snapshot be read backwards from its end, so the last N events are loaded
+# without reading the ones before them, and a torn append at the end of the
+# log is recognized (its lengths do not match) and cut off.
+#
+# Since MAGIC v2 every payload starts with a codec tag byte (session_codec.py);
+# v1 files hold untagged JSON payloads and are still read.
+MAGIC = b"LASESS2\n"
+LEGACY_MAGIC = b"LASESS1\n"
+LENGTH = struct.Struct("<I")
+
+# Decodes every tag (compression is only chosen when writing)
+_reader = SessionCodec("none")
+
+
+def encode_record(payload: bytes) -> bytes:
+    length = LENGTH.pack(len(payload))
+    return length + payload + length
+
+
+def _decoder(magic: bytes, path: str):
+    if magic == MAGIC:
+        return _reader.decode
+    if magic == LEGACY_MAGIC:
+        return lambda payload: payload
+    raise ValueError(f"{path} is not a session file.")
+
+
+def is_current(path: str) -> bool:
+    """Whether `path` is in the current format (appending to a v1 log would mix formats)."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_records(path: str) -> Tuple[List[bytes], int]:
+    """All intact (decoded) records of `path`, and the offset where the intact part ends."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < len(MAGIC) and MAGIC.startswith(data):
+        return [], 0  # Torn first write
+    decode = _decoder(data[:len(MAGIC)], path)
+    records, pos = [], len(MAGIC)
+    while pos + 2 * LENGTH.size <= len(data):
+        (size,) = LENGTH.unpack_from(data, pos)
+        end = pos + LENGTH.size + size
+        if end + LENGTH.size > len(data) or LENGTH.unpack_from(data, end)[0] != size:
+            break
+        records.append(decode(data[pos + LENGTH.size:end]))
+        pos = end + LENGTH.size
+    return records, pos
+
+
+def read_first_record(path: str) -> bytes:
+    with open(path, "rb") as f:
+        decode = _decoder(f.read(len(MAGIC)), path)
+        (size,) = LENGTH.unpack(f.read(LENGTH.size))
+        return decode(f.read(size))
+
+
+def read_last_records(path: str, count: int) -> List[bytes]:
+    """The last `count` records of a complete (atomically written) file, in file order."""
+    records = []
+    with open(path, "rb") as f:
+        decode = _decoder(f.read(len(MAGIC)), path)
+        pos = f.seek(0, os.SEEK_END)
+        while pos > len(MAGIC) and len(records) < count:
+            f.seek(pos - LENGTH.size)
+            (size,) = LENGTH.unpack(f.read(LENGTH.size))
+            start = pos - 2 * LENGTH.size - size
+            f.seek(start + LENGTH.size)
+            records.append(decode(f.read(size)))
+            pos = start
+    records.reverse()
+    return records
+
+
+def write_atomic(path: str, payloads: Iterable[bytes], codec: SessionCodec) -> int:
+    """Writes a whole file through a temp file + fsync + rename. Returns its size."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        for payload in payloads:
+            f.write(encode_record(codec.encode(payload)))
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+def append_records(path: str, payloads: Iterable[bytes], codec: SessionCodec,
+                   valid_end: Optional[int] = None) -> int:
+    """Appends to a log (created if missing), first cutting a torn tail at `valid_end`. Returns the new size."""
+    with open(path, "ab") as f:
+        if valid_end is not None and f.tell() != valid_end:
+            f.truncate(valid_end)
+            f.seek(valid_end)
+        if f.tell() == 0:
+            f.write(MAGIC)
+        f.write(b"".join(encode_record(codec.encode(p)) for p in payloads))
+        f.flush()
+        return f.tell()
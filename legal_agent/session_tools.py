@@ -0,0 +1,146 @@
+"""
+Bulk maintenance of the file session store. Every command streams over the
+shard directories one at a time, so memory stays flat however many sessions
+there are. Run migrate and vacuum while the server is stopped.
+
+    python -m legal_agent.session_tools count [DIR]
+    python -m legal_agent.session_tools migrate [DIR] [--dry-run]
+    python -m legal_agent.session_tools export OUT.jsonl[.gz] [DIR] [--user ID]
+    python -m legal_agent.session_tools vacuum [DIR] [--compact] [--dry-run]
+
+DIR defaults to legal_agent/sessions; the shard depth is SESSION_SHARD_DEPTH.
+"""
+import os
+import sys
+import gzip
+import time
+from typing import Optional
+
+from legal_agent.persistence import FileSessionService
+from legal_agent.session_layout import SESSION_SHARD_DEPTH, SessionLayout, is_session_id, split_name
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions")
+# Younger temp files may belong to a write that is still in progress
+TMP_MIN_AGE = 60
+
+
+def count(storage_dir: str) -> dict:
+    """Sessions, files and bytes per extension, and directories walked."""
+    layout = SessionLayout(storage_dir)
+    sessions, files, sizes, dirs = 0, {}, {}, 0
+    for directory, _ in layout.iter_dirs():
+        dirs += 1
+        for entry in layout.iter_entries(directory):
+            session_id, ext = split_name(entry.name)
+            files[ext] = files.get(ext, 0) + 1
+            sizes[ext] = sizes.get(ext, 0) + entry.stat().st_size
+            if ext == ".snap" or (ext == ".json" and not os.path.exists(os.path.join(directory, f"{session_id}.snap"))):
+                sessions += 1
+    return {"sessions": sessions, "files": files, "bytes": sizes, "dirs": dirs}
+
+
+def migrate(storage_dir: str, depth: int = SESSION_SHARD_DEPTH, dry_run: bool = False) -> dict:
+    """Moves every session file that is not where the current layout expects it (flat or other depth)."""
+    layout = SessionLayout(storage_dir, depth)
+    moved = 0
+    for entry in layout.iter_files():
+        session_id, ext = split_name(entry.name)
+        if ext == ".tmp" or not is_session_id(session_id):
+            continue  # Not a session file of ours; left where it is
+        if entry.path == layout.path(session_id, ext[1:]):
+            continue
+        if not dry_run:
+            os.replace(entry.path, layout.path(session_id, ext[1:], create=True))
+        moved += 1
+    removed_dirs = 0 if dry_run else _remove_empty_dirs(layout)
+    return {"moved": moved, "removed_dirs": removed_dirs, "dry_run": dry_run}
+
+
+def export(storage_dir: str, out_path: str, user_id: Optional[str] = None) -> dict:
+    """Writes one JSON line per session (all events) to `out_path`, gzipped if it ends in .gz."""
+    service = FileSessionService(storage_dir)
+    exported = skipped = 0
+    opener = gzip.open if out_path.endswith(".gz") else open
+    with opener(out_path, "wt", encoding="utf-8") as out:
+        for session_id in service.layout.iter_session_ids():
+            try:
+                session = service.load_session(session_id)
+            except Exception as e:
+                print(f"Skipping session {session_id}: {e}")
+                skipped += 1
+                continue
+            if session is None or (user_id is not None and session.user_id != user_id):
+                continue
+            out.write(session.model_dump_json())
+            out.write("\n")
+            exported += 1
+    return {"exported": exported, "skipped": skipped, "path": out_path}
+
+
+def vacuum(storage_dir: str, compact: bool = False, dry_run: bool = False) -> dict:
+    """
+    Removes leftovers: interrupted atomic writes (.tmp), logs without a
+    snapshot and legacy .json files already superseded by one, then empty shard
+    directories. With `compact`, also folds every remaining log and legacy file
+    into a snapshot.
+    """
+    service = FileSessionService(storage_dir)
+    layout = service.layout
+    removed, reclaimed, compacted = {}, 0, 0
+    now = time.time()
+    for entry in layout.iter_files():
+        session_id, ext = split_name(entry.name)
+        stat = entry.stat()
+        snap_exists = os.path.exists(os.path.join(os.path.dirname(entry.path), f"{session_id}.snap"))
+        if ext == ".tmp":
+            garbage = now - stat.st_mtime > TMP_MIN_AGE
+        elif ext in (".log", ".json"):
+            garbage = snap_exists if ext == ".json" else not snap_exists
+        else:
+            garbage = False
+        if garbage:
+            if not dry_run:
+                os.remove(entry.path)
+            removed[ext] = removed.get(ext, 0) + 1
+            reclaimed += stat.st_size
+        elif compact and ext in (".log", ".json") and not dry_run:
+            if service.compact_session(session_id):
+                compacted += 1
+    removed_dirs = 0 if dry_run else _remove_empty_dirs(layout)
+    return {"removed": removed, "reclaimed_bytes": reclaimed, "compacted": compacted,
+            "removed_dirs": removed_dirs, "dry_run": dry_run}
+
+
+def _remove_empty_dirs(layout: SessionLayout) -> int:
+    removed = 0
+    # Deepest first, so a shard emptied by its children goes too
+    for directory, level in sorted(layout.iter_dirs(), key=lambda d: -d[1]):
+        if level == 0:
+            continue
+        try:
+            os.rmdir(directory)
+            removed += 1
+        except OSError:
+            pass  # Not empty
+    return removed
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    flags = [a for a in sys.argv[1:] if a.startswith("--")]
+    command = args.pop(0) if args else "count"
+    user = None
+    if "--user" in sys.argv:
+        user = sys.argv[sys.argv.index("--user") + 1]
+        args.remove(user)
+    if command == "count":
+        print(count(args[0] if args else DEFAULT_DIR))
+    elif command == "migrate":
+        print(migrate(args[0] if args else DEFAULT_DIR, dry_run="--dry-run" in flags))
+    elif command == "export" and args:
+        print(export(args[1] if len(args) > 1 else DEFAULT_DIR, args[0], user))
+    elif command == "vacuum":
+        print(vacuum(args[0] if args else DEFAULT_DIR, compact="--compact" in flags, dry_run="--dry-run" in flags))
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from typing import List, Optional
+from google.adk.events import Event
+from google.adk.sessions.base_session_service import BaseSessionService
+from google.adk.sessions.session import Session
+
+from legal_agent.telemetry import span
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_user ON sessions (app_name, user_id, updated_at);
+CREATE INDEX IF NOT EXISTS sessions_by_update ON sessions (updated_at);
+CREATE TABLE IF NOT EXISTS events (
+    session_id TEXT NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+class SqliteSessionService(BaseSessionService):
+    """
+    Sessions in one embedded SQLite database (WAL mode), one row per event.
+
+    Every lookup is an index range: a user's sessions by (app_name, user_id,
+    updated_at), a session's events by (session_id, seq). Listing, paging
+    history and loading the last N events therefore cost the same however
+    many sessions are stored. Sessions are only returned to the user that
+    owns them.
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: a commit survives an app crash; an OS crash may lose the last ones
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self._lock = threading.Lock()
+        # Running totals for stats(), counted once here and kept up to date by every write,
+        # so a /metrics scrape never scans the tables
+        self._sessions = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        self._events = self._db.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    async def _run(self, fn, *args):
+        """Runs a statement batch off the event loop, serialized on the shared connection."""
+        def _locked():
+            with self._lock, span("session_db"):
+                return fn(*args)
+        return await asyncio.to_thread(_locked)
+
+    async def create_session(self, app_name: str, user_id: str) -> str:
+        session_id = str(uuid.uuid4())
+        now = time.time()
+
+        def _insert():
+            with self._db:
+                self._db.execute(
+                    "INSERT INTO sessions (id, app_name, user_id, state, created_at, updated_at) "
+                    "VALUES (?, ?, ?, '{}', ?, ?)",
+                    (session_id, app_name, user_id, now, now),
+                )
+            self._sessions += 1
+        await self._run(_insert)
+        return session_id
+
+    async def get_session(self, app_name: str, user_id: str, session_id: str, config=None) -> Optional[Session]:
+        """
+        Returns the session if `user_id` owns it. `config.num_recent_events` and
+        `config.after_timestamp` limit the events that are loaded.
+        """
+        tail = getattr(config, "num_recent_events", None)
+        after = getattr(config, "after_timestamp", None)
+
+        def _select():
+            row = self._db.execute(
+                "SELECT state, updated_at FROM sessions WHERE id = ? AND app_name = ? AND user_id = ?",
+                (session_id, app_name, user_id),
+            ).fetchone()
+            if row is None:
+                return None
+            query = "SELECT data FROM events WHERE session_id = ?"
+            params = [session_id]
+            if after is not None:
+                query += " AND timestamp >= ?"
+                params.append(after)
+            query += " ORDER BY seq DESC"
+            if tail is not None:
+                query += " LIMIT ?"
+                params.append(tail)
+            events = [data for (data,) in self._db.execute(query, params)]
+            events.reverse()
+            return row, events
+
+        result = await self._run(_select)
+        if result is None:
+            return None
+        (state, updated_at), events = result
+        session = Session(
+            id=session_id,
+            app_name=app_name,
+            user_id=user_id,
+            state=json.loads(state),
+            events=[Event.model_validate_json(data) for data in events],
+            last_update_time=updated_at,
+        )
+        return session
+
+    async def get_events(self, app_name: str, user_id: str, session_id: str,
+                         before_seq: Optional[int] = None, limit: int = 20) -> List[Event]:
+        """A page of history: up to `limit` events before `before_seq` (newest page by default)."""
+        def _select():
+            owner = self._db.execute(
+                "SELECT 1 FROM sessions WHERE id = ? AND app_name = ? AND user_id = ?",
+                (session_id, app_name, user_id),
+            ).fetchone()
+            if owner is None:
+                return []
+            rows = self._db.execute(
+                "SELECT data FROM events WHERE session_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (session_id, before_seq if before_seq is not None else 2 ** 62, limit),
+            ).fetchall()
+            return [data for (data,) in reversed(rows)]
+        return [Event.model_validate_json(data) for data in await self._run(_select)]
+
+    async def update_session(self, session: Session) -> None:
+        def _update():
+            with self._db:
+                self._db.execute(
+                    "UPDATE sessions SET state = ?, updated_at = ? WHERE id = ?",
+                    (json.dumps(session.state), time.time(), session.id),
+                )
+        await self._run(_update)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        if event.partial:
+            return event
+        data = event.model_dump_json(exclude_none=True)
+        state = json.dumps(session.state)
+
+        def _insert():
+            with self._db:
+                self._db.execute(
+                    "INSERT INTO events (session_id, seq, timestamp, data) VALUES "
+                    "(?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM events WHERE session_id = ?), ?, ?)",
+                    (session.id, session.id, event.timestamp, data),
+                )
+                self._db.execute(
+                    "UPDATE sessions SET state = ?, updated_at = ? WHERE id = ?",
+                    (state, event.timestamp, session.id),
+                )
+            self._events += 1
+        await self._run(_insert)
+        return event
+
+    async def save_session(self, session_id: str) -> None:
+        """Events are committed as they are appended; nothing is pending."""
+
+    async def close(self) -> None:
+        await self._run(self._db.close)
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "sessions": self._sessions, "events": self._events}
+
+    async def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        def _delete():
+            with self._db:
+                events = self._db.execute(
+                    "SELECT COUNT(*) FROM events WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+                deleted = self._db.execute(
+                    "DELETE FROM sessions WHERE id = ? AND app_name = ? AND user_id = ?",
+                    (session_id, app_name, user_id),
+                ).rowcount
+            if deleted:
+                self._sessions -= deleted
+                self._events -= events
+        await self._run(_delete)
+
+    def purge_expired(self, cutoff: float, limit: int) -> dict:
+        """
+        One step of the retention sweep (see janitor.py): deletes up to `limit`
+        sessions last updated before `cutoff` (epoch seconds), with their events.
+        """
+        with self._lock, self._db:
+            expired = [session_id for (session_id,) in self._db.execute(
+                "SELECT id FROM sessions WHERE updated_at < ? ORDER BY updated_at LIMIT ?", (cutoff, limit)
+            )]
+            if not expired:
+                return {"scanned": 0, "removed": 0, "bytes": 0, "done": True}
+            marks = ",".join("?" * len(expired))
+            events, freed = self._db.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM events WHERE session_id IN ({marks})", expired
+            ).fetchone()
+            self._db.execute(f"DELETE FROM sessions WHERE id IN ({marks})", expired)
+        self._sessions -= len(expired)
+        self._events -= events
+        # Pages are reused by later inserts; the file itself only shrinks with VACUUM
+        return {"scanned": len(expired), "removed": len(expired), "bytes": freed, "done": len(expired) < limit}
+
+    async def list_sessions(self, app_name: str, user_id: str) -> List[str]:
+        """The user's session ids, least recently updated first."""
+        def _select():
+            return [
+                session_id for (session_id,) in self._db.execute(
+                    "SELECT id FROM sessions WHERE app_name = ? AND user_id = ? ORDER BY updated_at",
+                    (app_name, user_id),
+                )
+            ]
+        return await self._run(_select)
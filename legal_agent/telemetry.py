@@ -0,0 +1,299 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+# Optional: with prometheus_client installed its registry (and process metrics)
+# is used; otherwise a minimal built-in registry renders the same text format.
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 12, 16)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Built-in fallback for prometheus_client's Counter / Gauge / Histogram (labels, inc, set, observe)."""
+
+    def __init__(self, kind: str, name: str, doc: str, labelnames=(), buckets=SPAN_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._children: Dict[tuple, "_Metric"] = {}
+        self._value = 0.0
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+
+    def labels(self, **labels) -> "_Metric":
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = _Metric(self.kind, self.name, self.doc, (), self.buckets)
+            return child
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items()) if self.labelnames else [((), self)]
+        for key, child in children:
+            with child._lock:
+                if self.kind != "histogram":
+                    lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child._value)}")
+                    continue
+                for bound, count in zip(self.buckets, child._counts):
+                    le = 'le="%g"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {child._count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(child._sum)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {child._count}")
+        return "\n".join(lines)
+
+
+_fallback_metrics = []
+
+
+def _metric(kind: str, name: str, doc: str, labelnames=(), buckets=SPAN_BUCKETS):
+    if prometheus_client is not None:
+        if kind == "histogram":
+            return prometheus_client.Histogram(name, doc, labelnames, buckets=buckets)
+        cls = prometheus_client.Counter if kind == "counter" else prometheus_client.Gauge
+        # prometheus_client appends _total to counters itself
+        return cls(name[:-len("_total")] if kind == "counter" else name, doc, labelnames)
+    metric = _Metric(kind, name, doc, labelnames, buckets)
+    _fallback_metrics.append(metric)
+    return metric
+
+
+SPAN_SECONDS = _metric("histogram", "legal_agent_span_seconds", "Time spent in instrumented spans.", ["span"])
+SPAN_ERRORS = _metric("counter", "legal_agent_span_errors_total", "Spans that raised.", ["span"])
+TURN_SECONDS = _metric("histogram", "legal_agent_turn_seconds", "Duration of whole chat turns.", ["mode"])
+TURN_TOOL_CALLS = _metric("histogram", "legal_agent_turn_tool_calls", "Tool calls per chat turn.",
+                          ["mode"], COUNT_BUCKETS)
+TOOL_CALLS = _metric("counter", "legal_agent_tool_calls_total", "Tool calls by tool and outcome.", ["tool", "status"])
+LLM_CALLS = _metric("counter", "legal_agent_llm_calls_total", "LLM calls by outcome.", ["status"])
+LLM_TOKENS = _metric("counter", "legal_agent_llm_tokens_total", "LLM tokens (direction: in = prompt, out = output).",
+                     ["direction"])
+CACHE_HIT_RATIO = _metric("gauge", "legal_agent_cache_hit_ratio", "Hit ratio of each cache since start.", ["cache"])
+CACHE_LOOKUPS = _metric("gauge", "legal_agent_cache_lookups", "Cache lookups since start.", ["cache", "result"])
+COMPONENT_STATE = _metric("gauge", "legal_agent_component_state", "Current values reported by components' stats().",
+                          ["component", "field"])
+
+
+class TurnTrace:
+    """Per-turn latency breakdown: time and calls per span, tool calls and tokens."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.spans: Dict[str, list] = {}  # span -> [calls, seconds]
+        self.tool_calls = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.spans.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def breakdown(self) -> dict:
+        with self._lock:
+            return {
+                "seconds": round(time.perf_counter() - self.started, 3),
+                "spans": {name: {"calls": c, "seconds": round(s, 3)} for name, (c, s) in self.spans.items()},
+                "tool_calls": self.tool_calls,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+            }
+
+
+# The turn being traced; copied into tasks, to_thread calls and ADK's tool threads
+_current_turn: contextvars.ContextVar[Optional[TurnTrace]] = contextvars.ContextVar("turn_trace", default=None)
+
+
+def current_turn() -> Optional[TurnTrace]:
+    return _current_turn.get()
+
+
+def record(name: str, seconds: float, error: bool = False) -> None:
+    SPAN_SECONDS.labels(span=name).observe(seconds)
+    if error:
+        SPAN_ERRORS.labels(span=name).inc()
+    trace = _current_turn.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    """Times the block into legal_agent_span_seconds{span=name} and the current turn's breakdown."""
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(name, time.perf_counter() - started, error)
+
+
+@contextmanager
+def turn(mode: str):
+    """Traces one chat turn; yields its TurnTrace."""
+    trace = TurnTrace(mode)
+    token = _current_turn.set(trace)
+    try:
+        yield trace
+    finally:
+        try:
+            _current_turn.reset(token)
+        except ValueError:
+            pass  # Closed from another context (an abandoned stream being collected)
+        TURN_SECONDS.labels(mode=mode).observe(time.perf_counter() - trace.started)
+        TURN_TOOL_CALLS.labels(mode=mode).observe(trace.tool_calls)
+
+
+class TelemetryPlugin(BasePlugin):
+    """ADK plugin timing every LLM and tool call of the runner, and counting tokens."""
+
+    def __init__(self):
+        super().__init__(name="telemetry")
+        # Start times, by invocation (LLM calls) and by function call id (tools)
+        self._model_started: Dict[str, float] = {}
+        self._tool_started: Dict[str, float] = {}
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        self._model_started[callback_context.invocation_id] = time.perf_counter()
+        return None
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        if llm_response.partial:
+            return None  # Streaming chunk; the call ends with the final response
+        started = self._model_started.pop(callback_context.invocation_id, None)
+        if started is not None:
+            record("llm", time.perf_counter() - started)
+        LLM_CALLS.labels(status="ok").inc()
+        usage = llm_response.usage_metadata
+        if usage is not None:
+            tokens_in, tokens_out = usage.prompt_token_count or 0, usage.candidates_token_count or 0
+            LLM_TOKENS.labels(direction="in").inc(tokens_in)
+            LLM_TOKENS.labels(direction="out").inc(tokens_out)
+            trace = _current_turn.get()
+            if trace is not None:
+                trace.tokens_in += tokens_in
+                trace.tokens_out += tokens_out
+        return None
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error):
+        started = self._model_started.pop(callback_context.invocation_id, None)
+        if started is not None:
+            record("llm", time.perf_counter() - started, error=True)
+        LLM_CALLS.labels(status="error").inc()
+        return None
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context):
+        self._tool_started[tool_context.function_call_id] = time.perf_counter()
+        trace = _current_turn.get()
+        if trace is not None:
+            trace.tool_calls += 1
+        return None
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result):
+        self._finish_tool(tool.name, tool_context.function_call_id, "ok")
+        return None
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error):
+        self._finish_tool(tool.name, tool_context.function_call_id, "error")
+        return None
+
+    def _finish_tool(self, name: str, call_id: str, status: str) -> None:
+        started = self._tool_started.pop(call_id, None)
+        if started is not None:
+            record(f"tool:{name}", time.perf_counter() - started, error=status == "error")
+        TOOL_CALLS.labels(tool=name, status=status).inc()
+
+
+# Components whose stats() are exported at scrape time: name -> callable
+_stats_sources: Dict[str, Callable[[], dict]] = {}
+
+
+def register_stats(name: str, source: Callable[[], dict]) -> None:
+    """Exports a component's stats() on /metrics: hit/miss counts as cache gauges, other numbers as state."""
+    _stats_sources[name] = source
+
+
+def _collect_stats() -> None:
+    for name, source in list(_stats_sources.items()):
+        try:
+            _export_stats(name, source())
+        except Exception:
+            continue
+
+
+def _export_stats(component: str, stats: dict) -> None:
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            # Nested stats (e.g. the session cache inside the session service)
+            _export_stats(f"{component}.{key}", value)
+        else:
+            _set_stat(component, key, value)
+
+
+def _set_stat(component: str, field: str, value) -> None:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return
+    if field == "hit_rate":
+        CACHE_HIT_RATIO.labels(cache=component).set(value)
+    elif field in ("hits", "misses", "disk_hits"):
+        CACHE_LOOKUPS.labels(cache=component, result=field).set(value)
+    else:
+        COMPONENT_STATE.labels(component=component, field=field).set(value)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """The /metrics payload and its content type."""
+    _collect_stats()
+    if prometheus_client is not None:
+        return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
+    return ("\n".join(m.render() for m in _fallback_metrics) + "\n").encode("utf-8"), CONTENT_TYPE
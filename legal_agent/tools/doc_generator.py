@@ -3,6 +3,8 @@ import json
 from docx import Document
 from datetime import datetime
 
+from legal_agent.telemetry import span
+
 # Define where templates live and where drafts go
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TEMPLATE_DIR = os.path.join(BASE_DIR, "data", "templates")
@@ -76,7 +78,8 @@ def generate_legal_document(doc_type: str, user_details_json: str) -> str:
             return f"Error: No template found for '{doc_type}' in {TEMPLATE_DIR}"
 
         # 3. Load Document
-        doc = Document(template_path)
+        with span("docx_load"):
+            doc = Document(template_path)
         
         # 4. Replace Placeholders
         for key, value in data.items():
@@ -99,7 +102,8 @@ def generate_legal_document(doc_type: str, user_details_json: str) -> str:
         filename = f"Draft_{doc_type}_{timestamp}.docx"
         output_path = os.path.join(OUTPUT_DIR, filename)
         
-        doc.save(output_path)
+        with span("docx_save"):
+            doc.save(output_path)
         
         return f"Success! Document created at: {output_path}"
 
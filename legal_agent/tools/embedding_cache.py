@@ -0,0 +1,187 @@
+import os
+import time
+import array
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form used as the cache key."""
+    return " ".join(text.casefold().split())
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU + TTL cache for query embeddings, keyed by (model, normalized text).
+
+    Entries are evicted when the cache holds more than `max_entries` or when they
+    are older than `ttl` seconds. If `spill_path` is set, entries are also written
+    to a small SQLite file so hits survive restarts; a memory miss falls back to
+    that file before reporting a miss. `aget`/`aput` do that file's I/O in a
+    worker thread, for callers on the event loop.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 24 * 3600, spill_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (vector, created_at)
+        self._lock = threading.Lock()
+        # Guards the SQLite connection; taken without `_lock` so disk I/O never holds up memory hits
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._db = None
+        if spill_path:
+            os.makedirs(os.path.dirname(os.path.abspath(spill_path)), exist_ok=True)
+            self._db = sqlite3.connect(spill_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=OFF")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, created REAL)"
+            )
+            self._db.execute("DELETE FROM embeddings WHERE created < ?", (time.time() - ttl,))
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha1(f"{model}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = self.make_key(model, text)
+        vector = self._get_memory(key)
+        if vector is None and self._db is not None:
+            vector = self._get_disk(key)
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+        return vector
+
+    async def aget(self, model: str, text: str) -> Optional[List[float]]:
+        """Like `get`, but a memory miss reads the SQLite file in a worker thread."""
+        key = self.make_key(model, text)
+        vector = self._get_memory(key)
+        if vector is None and self._db is not None:
+            vector = await asyncio.to_thread(self._get_disk, key)
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+        return vector
+
+    def put(self, model: str, text: str, vector: List[float]) -> None:
+        key = self.make_key(model, text)
+        created = time.time()
+        with self._lock:
+            self._insert(key, vector, created)
+        if self._db is not None:
+            self._put_disk(key, vector, created)
+
+    async def aput(self, model: str, text: str, vector: List[float]) -> None:
+        """Like `put`, but writes the SQLite file in a worker thread."""
+        key = self.make_key(model, text)
+        created = time.time()
+        with self._lock:
+            self._insert(key, vector, created)
+        if self._db is not None:
+            await asyncio.to_thread(self._put_disk, key, vector, created)
+
+    def _get_memory(self, key: str) -> Optional[List[float]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            del self._entries[key]
+            self.evictions += 1
+            return None
+
+    def _get_disk(self, key: str) -> Optional[List[float]]:
+        # The memory lock is not held here, so lookups of other keys are never stuck behind the disk
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT vector, created FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] >= self.ttl:
+            return None
+        vector = array.array("f", row[0]).tolist()
+        with self._lock:
+            self._insert(key, vector, row[1])
+            self.hits += 1
+            self.disk_hits += 1
+        return vector
+
+    def _put_disk(self, key: str, vector: List[float], created: float) -> None:
+        with self._db_lock:
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created) VALUES (?, ?, ?)",
+                (key, array.array("f", vector).tobytes(), created)
+            )
+            self._db.commit()
+
+    def _insert(self, key: str, vector: List[float], created: float) -> None:
+        self._entries[key] = (vector, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+# Global cache (Lazy loaded)
+_cache = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(
+            max_entries=int(os.getenv("EMBED_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("EMBED_CACHE_TTL", str(24 * 3600))),
+            spill_path=os.getenv("EMBED_CACHE_PATH") or None,
+        )
+    return _cache
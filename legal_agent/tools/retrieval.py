@@ -1,13 +1,33 @@
 import os
-import weaviate
-from weaviate.auth import AuthApiKey
+import time
+import asyncio
+import logging
+import concurrent.futures
 # from langchain_ollama import OllamaEmbeddings (Lazy load instead)
 from dotenv import load_dotenv
 
+from .weaviate_pool import connect, get_pool, PoolExhausted
+from .embedding_cache import get_embedding_cache
+from .semantic_cache import get_semantic_cache
+from legal_agent.index import get_backend
+from legal_agent.index.lexical import get_lexical_index, reciprocal_rank_fusion, tokenize
+from legal_agent.index.statute import get_section_index
+from legal_agent.index.status import get_index_status
+from legal_agent.telemetry import span
+
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
+RETRIEVAL_TIMEOUT = float(os.getenv("RETRIEVAL_TIMEOUT", "15"))
+RESULT_LIMIT = 10
+# Each ranker contributes this many candidates to reciprocal-rank fusion
+CANDIDATE_LIMIT = 2 * RESULT_LIMIT
+EMBED_MODEL = "nomic-embed-text"
+
 # Global init for efficiency (Lazy loaded)
 embeddings = None
+_sync_executor = None
 
 def get_embeddings():
     global embeddings
@@ -15,70 +35,181 @@ def get_embeddings():
         try:
             from langchain_ollama import OllamaEmbeddings
             base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-            print(f"DEBUG: Using Ollama at {base_url}")
-            embeddings = OllamaEmbeddings(model="nomic-embed-text", base_url=base_url)
+            logger.info(f"Using Ollama at {base_url}")
+            embeddings = OllamaEmbeddings(model=EMBED_MODEL, base_url=base_url)
         except ImportError:
-            print("WARNING: langchain-ollama not found (unexpected). Using Mock.")
+            logger.warning("langchain-ollama not found (unexpected). Using Mock.")
             class MockEmbeddings:
                 def embed_query(self, text): return [0.0] * 768
+                async def aembed_query(self, text): return [0.0] * 768
             embeddings = MockEmbeddings()
     return embeddings
 
+def embed_query(query: str) -> list:
+    """Embeds a query, reusing cached vectors for repeated questions."""
+    cache = get_embedding_cache()
+    vector = cache.get(EMBED_MODEL, query)
+    if vector is None:
+        vector = get_embeddings().embed_query(query)
+        cache.put(EMBED_MODEL, query, vector)
+    return vector
+
+async def aembed_query(query: str) -> list:
+    """Embeds without blocking the event loop, reusing cached vectors."""
+    cache = get_embedding_cache()
+    vector = await cache.aget(EMBED_MODEL, query)
+    if vector is not None:
+        return vector
+    emb = get_embeddings()
+    if hasattr(emb, "aembed_query"):
+        vector = await emb.aembed_query(query)
+    else:
+        vector = await asyncio.to_thread(emb.embed_query, query)
+    await cache.aput(EMBED_MODEL, query, vector)
+    return vector
+
 def get_client():
-    return weaviate.connect_to_weaviate_cloud(
-        cluster_url=os.getenv("WEAVIATE_URL"),
-        auth_credentials=AuthApiKey(os.getenv("WEAVIATE_API_KEY"))
-    )
+    """Opens a dedicated (unpooled) connection. Callers must close it."""
+    return connect()
+
+def _format_results(hits) -> dict:
+    results = []
+    for hit in hits:
+        result = {
+            "text": hit.get("text"),
+            "source": hit.get("source"),
+            # Keyword-only matches and direct section lookups have no vector distance
+            "score": round(1 - hit["distance"], 2) if hit.get("distance") is not None else None
+        }
+        for field in ("act", "section", "heading"):
+            if hit.get(field):
+                result[field] = hit[field]
+        results.append(result)
+
+    logger.debug("Found %d docs.", len(results))
+    return {"results": results} if results else {"message": "No docs found."}
+
+def _degraded_response():
+    """While the startup job has no index ready, steer the agent to web search."""
+    status = get_index_status()
+    if not status.degraded:
+        return None
+    if status.state == "ingesting":
+        done = status.snapshot()["progress"].get("chunks_embedded", 0)
+        reason = f"The legal database is still being built ({done} passages indexed so far)."
+    else:
+        reason = "The legal database is not available right now."
+    return {"error": f"{reason} Use 'search_web' to answer this question instead."}
+
+def _section_lookup(query: str):
+    """Answers "Section 17 of RERA" style queries from the section index, or None."""
+    index = get_section_index()
+    hits = index.lookup(query) if index else None
+    if hits:
+        logger.debug("Direct section lookup.")
+        return _format_results(hits)
+    return None
+
+def _cache_tag(query: str) -> tuple:
+    """Numbers in the query (section numbers, hours, years) must match for a cache hit."""
+    return tuple(sorted({t for t in tokenize(query) if t.isdigit()}))
+
+def _hybrid(query: str, vector_hits: list) -> list:
+    """Fuses vector hits with BM25 hits when a lexical index is available."""
+    lexical = get_lexical_index()
+    if lexical is None:
+        return vector_hits[:RESULT_LIMIT]
+    keyword_hits = lexical.search(query, CANDIDATE_LIMIT)
+    return reciprocal_rank_fusion([vector_hits, keyword_hits], limit=RESULT_LIMIT)
+
+def _cache_result(query: str, query_vector, result: dict, started: float) -> dict:
+    if "results" in result:
+        get_semantic_cache().store(query_vector, result, time.perf_counter() - started, tag=_cache_tag(query))
+    return result
+
+async def _aexecute_retrieval(query: str) -> dict:
+    # 0. Citations of a specific section skip embedding and search altogether
+    direct = _section_lookup(query)
+    if direct is not None:
+        return direct
+
+    # 1. Vectorize Query Locally (Ollama)
+    with span("embed"):
+        query_vector = await aembed_query(query)
 
-def retrieve_legal_info(query: str) -> dict:
+    # Paraphrases of a recent query reuse its results without touching the index
+    cached = get_semantic_cache().lookup(query_vector, tag=_cache_tag(query))
+    if cached is not None:
+        logger.debug("Semantic cache hit.")
+        return cached
+    started = time.perf_counter()
+
+    # 2. Search the configured backend (Weaviate Cloud or the local index) + BM25
+    with span("vector_search"):
+        hits = await get_backend().asearch(query_vector, CANDIDATE_LIMIT)
+    return _cache_result(query, query_vector, _format_results(_hybrid(query, hits)), started)
+
+async def retrieve_legal_info(query: str) -> dict:
     """
     Search the government database for laws, acts, and rights.
     Args:
         query: The user's question (e.g., "rights for defective goods").
     """
-    print(f"DEBUG: Starting retrieval for {query}...")
-    client = get_client()
+    logger.debug("Starting retrieval for %r", query)
+    degraded = _degraded_response()
+    if degraded is not None:
+        return degraded
+    try:
+        # Real deadline: the embedding call and the query are cancelled on timeout
+        return await asyncio.wait_for(_aexecute_retrieval(query), timeout=RETRIEVAL_TIMEOUT)
+    except asyncio.TimeoutError:
+        return {"error": f"Retrieval timed out after {RETRIEVAL_TIMEOUT:g} seconds."}
+    except PoolExhausted:
+        return {"error": "Retrieval is busy, please try again shortly."}
+    except Exception as e:
+        logger.exception(f"Error in retrieval: {e}")
+        return {"error": str(e)}
+
+def retrieve_legal_info_sync(query: str) -> dict:
+    """
+    Blocking variant of `retrieve_legal_info` for scripts and non-async callers.
+    Args:
+        query: The user's question (e.g., "rights for defective goods").
+    """
+    global _sync_executor
+    logger.debug("Starting retrieval for %r", query)
+    degraded = _degraded_response()
+    if degraded is not None:
+        return degraded
     try:
-        import concurrent.futures
-        
         def _execute_retrieval():
-            collection = client.collections.get("LegalDocs")
-            
-            # 1. Vectorize Query Locally (Ollama)
-            print("DEBUG: Embedding query...")
-            query_vector = get_embeddings().embed_query(query)
-            print("DEBUG: Embedding done.")
-            
-            # 2. Search Cloud
-            print("DEBUG: Querying Weaviate...")
-            response = collection.query.near_vector(
-                near_vector=query_vector,
-                limit=10,
-                return_metadata=["distance"]
+            direct = _section_lookup(query)
+            if direct is not None:
+                return direct
+            # 1. Vectorize Query Locally (Ollama) - before borrowing a client
+            with span("embed"):
+                query_vector = embed_query(query)
+            cached = get_semantic_cache().lookup(query_vector, tag=_cache_tag(query))
+            if cached is not None:
+                return cached
+            started = time.perf_counter()
+
+            with span("vector_search"):
+                hits = get_backend().search(query_vector, CANDIDATE_LIMIT)
+            return _cache_result(query, query_vector, _format_results(_hybrid(query, hits)), started)
+
+        # Shared executor, so a timed-out call does not hold the caller until the worker ends
+        if _sync_executor is None:
+            _sync_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=get_pool().size, thread_name_prefix="retrieval"
             )
-            print("DEBUG: Weaviate query done.")
-            return response
-
-        # Enforce 15s timeout
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(_execute_retrieval)
-            try:
-                response = future.result(timeout=15)
-            except concurrent.futures.TimeoutError:
-                return {"error": "Retrieval timed out after 15 seconds."}
-
-        results = []
-        for obj in response.objects:
-            results.append({
-                "text": obj.properties.get("text"),
-                "source": obj.properties.get("source"),
-                "score": round(1 - obj.metadata.distance, 2)
-            })
-            
-        print(f"DEBUG: Found {len(results)} docs.")
-        return {"results": results} if results else {"message": "No docs found."}
+        future = _sync_executor.submit(_execute_retrieval)
+        try:
+            return future.result(timeout=RETRIEVAL_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            return {"error": f"Retrieval timed out after {RETRIEVAL_TIMEOUT:g} seconds."}
+    except PoolExhausted:
+        return {"error": "Retrieval is busy, please try again shortly."}
     except Exception as e:
-        print(f"DEBUG: Error in retrieval: {e}")
+        logger.exception(f"Error in retrieval: {e}")
         return {"error": str(e)}
-    finally:
-        client.close()
\ No newline at end of file
@@ -0,0 +1,156 @@
+import os
+import time
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_DATA_DIR = os.getenv("INDEX_DATA_DIR", os.path.join(BASE_DIR, "index_data"))
+GENERATION_FILE = os.path.join(INDEX_DATA_DIR, "GENERATION")
+
+
+def read_index_generation() -> int:
+    """Returns the current index generation (0 if ingestion never recorded one)."""
+    try:
+        return os.stat(GENERATION_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def bump_index_generation() -> None:
+    """
+    Marks the LegalDocs index as rebuilt. Caches in every process compare the
+    marker's mtime on lookup, so this also reaches a server running elsewhere.
+    """
+    os.makedirs(INDEX_DATA_DIR, exist_ok=True)
+    with open(GENERATION_FILE, "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+    if _cache is not None:
+        _cache.clear()
+
+
+class SemanticResultCache:
+    """
+    Reuses whole retrieval result sets for near-duplicate query vectors.
+
+    Normalized query vectors live in one preallocated float32 matrix, so a lookup
+    is a single matrix-vector product. A hit is the most similar entry within
+    `max_distance` (cosine distance) that is younger than `ttl` and was stored
+    with the same `tag`. Tags keep apart queries that embed almost identically
+    but must not share results, e.g. "Section 17" vs "Section 18". When full,
+    the least recently used entry is overwritten.
+    """
+
+    def __init__(self, max_entries: int = 256, max_distance: float = 0.08, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vectors = None  # (max_entries, dim) float32, allocated on first store
+        self._results = [None] * max_entries
+        self._tags = [None] * max_entries
+        self._created = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._latency = np.zeros(max_entries)
+        self._size = 0
+        self._generation = read_index_generation()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _check_generation(self) -> None:
+        generation = read_index_generation()
+        if generation != self._generation:
+            logger.info("LegalDocs index changed, dropping semantic result cache.")
+            self._clear()
+            self._generation = generation
+
+    def lookup(self, vector, tag=None) -> Optional[dict]:
+        q = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            self._check_generation()
+            if self._size == 0 or q.shape[0] != self._vectors.shape[1]:
+                self.misses += 1
+                return None
+            sims = self._vectors[:self._size] @ q
+            sims[now - self._created[:self._size] >= self.ttl] = -np.inf
+            sims[[i for i in range(self._size) if self._tags[i] != tag]] = -np.inf
+            best = int(np.argmax(sims))
+            if 1.0 - sims[best] > self.max_distance:
+                self.misses += 1
+                return None
+            self._last_used[best] = now
+            self.hits += 1
+            self.saved_seconds += float(self._latency[best])
+            return self._results[best]
+
+    def store(self, vector, result: dict, search_seconds: float, tag=None) -> None:
+        """Caches `result` for `vector`; `search_seconds` is what a later hit saves."""
+        q = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            self._check_generation()
+            if self._vectors is None or q.shape[0] != self._vectors.shape[1]:
+                self._vectors = np.zeros((self.max_entries, q.shape[0]), dtype=np.float32)
+                self._size = 0
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            self._vectors[slot] = q
+            self._results[slot] = result
+            self._tags[slot] = tag
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._latency[slot] = search_seconds
+
+    def _clear(self) -> None:
+        self._size = 0
+        self._results = [None] * self.max_entries
+        self._tags = [None] * self.max_entries
+        self._last_used[:] = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+            self._generation = read_index_generation()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "saved_search_seconds": round(self.saved_seconds, 3),
+        }
+
+
+# Global cache (Lazy loaded)
+_cache = None
+
+
+def get_semantic_cache() -> SemanticResultCache:
+    global _cache
+    if _cache is None:
+        _cache = SemanticResultCache(
+            max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "256")),
+            max_distance=float(os.getenv("SEMANTIC_CACHE_DISTANCE", "0.08")),
+            ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+        )
+    return _cache
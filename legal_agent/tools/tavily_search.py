@@ -1,19 +1,24 @@
 import os
 import json
+import logging
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Safe Import
 try:
     from tavily import TavilyClient
     TAVILY_AVAILABLE = True
 except ImportError:
     TAVILY_AVAILABLE = False
-    print("WARNING: 'tavily' package not found. Web search will be disabled.")
+    logger.warning("'tavily' package not found. Web search will be disabled.")
 
 import concurrent.futures
 
+from legal_agent.telemetry import span
+
 def search_web(query: str) -> str:
     """
     Searches the web using Tavily API for recent legal cases, news, or judgments.
@@ -37,7 +42,7 @@ def search_web(query: str) -> str:
             )
 
         # Enforce 10s timeout
-        with concurrent.futures.ThreadPoolExecutor() as executor:
+        with span("tavily"), concurrent.futures.ThreadPoolExecutor() as executor:
             future = executor.submit(_do_search)
             try:
                 response = future.result(timeout=10)
@@ -0,0 +1,293 @@
+import os
+import queue
+import asyncio
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+import weaviate
+from weaviate.auth import AuthApiKey
+from weaviate.exceptions import (
+    WeaviateClosedClientError,
+    WeaviateConnectionError,
+    WeaviateGRPCUnavailableError,
+    WeaviateTimeoutError,
+)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the underlying connection is unusable (as opposed to a bad query)
+CONNECTION_ERRORS = (
+    WeaviateClosedClientError,
+    WeaviateConnectionError,
+    WeaviateGRPCUnavailableError,
+    WeaviateTimeoutError,
+)
+
+
+class PoolExhausted(Exception):
+    """Raised when no pooled client frees up within the acquire timeout."""
+
+
+def connect() -> weaviate.WeaviateClient:
+    """Opens a new Weaviate Cloud connection using the environment config."""
+    w_key = os.getenv("WEAVIATE_API_KEY")
+    return weaviate.connect_to_weaviate_cloud(
+        cluster_url=os.getenv("WEAVIATE_URL"),
+        auth_credentials=AuthApiKey(w_key) if w_key else None
+    )
+
+
+async def connect_async() -> weaviate.WeaviateAsyncClient:
+    """Async counterpart of `connect()`. The client is bound to the running loop."""
+    w_key = os.getenv("WEAVIATE_API_KEY")
+    client = weaviate.use_async_with_weaviate_cloud(
+        cluster_url=os.getenv("WEAVIATE_URL"),
+        auth_credentials=AuthApiKey(w_key) if w_key else None
+    )
+    await client.connect()
+    return client
+
+
+class WeaviatePool:
+    """
+    Process-wide pool of long-lived Weaviate clients.
+
+    Clients are opened lazily up to `size` and handed out exclusively, so `size`
+    is also the cap on concurrent in-flight queries. A client that has been idle
+    longer than `health_interval` seconds is health-checked before reuse, and any
+    client that fails with a connection error is closed and replaced.
+    """
+
+    def __init__(self, size: int = 4, acquire_timeout: float = 10.0,
+                 health_interval: float = 30.0, connect_fn=connect):
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.health_interval = health_interval
+        self._connect = connect_fn
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._open = 0
+        self._closed = False
+
+    def _new_client(self):
+        client = self._connect()
+        with self._lock:
+            self._open += 1
+        logger.info(f"Opened pooled Weaviate client ({self._open}/{self.size}).")
+        return client
+
+    def _discard(self, client) -> None:
+        with self._lock:
+            self._open -= 1
+        try:
+            client.close()
+        except Exception as e:
+            logger.warning(f"Error closing Weaviate client: {e}")
+
+    def _healthy(self, client) -> bool:
+        try:
+            return client.is_connected() and client.is_ready()
+        except Exception:
+            return False
+
+    def _checkout(self):
+        while True:
+            try:
+                client, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._new_client()
+            if time.monotonic() - last_used < self.health_interval or self._healthy(client):
+                return client
+            logger.warning("Pooled Weaviate client failed health check, reconnecting.")
+            self._discard(client)
+
+    @contextmanager
+    def client(self, timeout: float = None):
+        """Borrows a client for the duration of the `with` block."""
+        if self._closed:
+            raise RuntimeError("WeaviatePool is closed.")
+        timeout = self.acquire_timeout if timeout is None else timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolExhausted(f"No Weaviate client available after {timeout}s.")
+        client = None
+        broken = False
+        try:
+            client = self._checkout()
+            yield client
+        except CONNECTION_ERRORS:
+            broken = True
+            raise
+        finally:
+            if client is not None:
+                if broken or self._closed:
+                    self._discard(client)
+                else:
+                    self._idle.put((client, time.monotonic()))
+            self._slots.release()
+
+    def run(self, fn, retries: int = 1):
+        """Calls `fn(client)`, retrying on a fresh connection if the connection drops."""
+        for attempt in range(retries + 1):
+            try:
+                with self.client() as client:
+                    return fn(client)
+            except CONNECTION_ERRORS as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"Weaviate connection error ({e}), retrying with a new client.")
+
+    def close(self) -> None:
+        """Closes every idle client. Borrowed clients are closed as they are returned."""
+        self._closed = True
+        while True:
+            try:
+                client, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(client)
+        logger.info("Weaviate pool closed.")
+
+    def stats(self) -> dict:
+        return {"size": self.size, "open": self._open, "idle": self._idle.qsize()}
+
+
+# Global pool (Lazy loaded)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> WeaviatePool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = WeaviatePool(
+                    size=int(os.getenv("WEAVIATE_POOL_SIZE", "4")),
+                    acquire_timeout=float(os.getenv("WEAVIATE_ACQUIRE_TIMEOUT", "10")),
+                    health_interval=float(os.getenv("WEAVIATE_HEALTH_INTERVAL", "30")),
+                )
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+class AsyncWeaviateManager:
+    """
+    Long-lived async Weaviate client for code running on the server event loop.
+
+    The async client multiplexes concurrent queries over one gRPC channel, so a
+    single connection is enough; an asyncio.Semaphore caps the number of
+    in-flight queries instead. Async clients are bound to the loop that opened
+    them, so only the loop registered via `start()` keeps a persistent client.
+    Calls from any other loop get a connection scoped to that call.
+    """
+
+    def __init__(self, max_inflight: int = 16, health_interval: float = 30.0,
+                 connect_fn=connect_async):
+        self.max_inflight = max_inflight
+        self.health_interval = health_interval
+        self._connect = connect_fn
+        self._loop = None
+        self._client = None
+        self._last_ok = 0.0
+        self._slots = None
+        self._connect_lock = None
+
+    def start(self) -> None:
+        """Binds the manager to the running loop (call from the server lifespan)."""
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_inflight)
+        self._connect_lock = asyncio.Lock()
+
+    def is_bound(self) -> bool:
+        """True when called on the loop that owns the persistent client."""
+        try:
+            return self._loop is asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+    async def _get_client(self):
+        async with self._connect_lock:
+            client = self._client
+            if client is not None and time.monotonic() - self._last_ok >= self.health_interval:
+                try:
+                    healthy = client.is_connected() and await client.is_ready()
+                except Exception:
+                    healthy = False
+                if not healthy:
+                    logger.warning("Async Weaviate client failed health check, reconnecting.")
+                    await self._close_client(client)
+                    client = self._client = None
+            if client is None:
+                client = self._client = await self._connect()
+                logger.info("Opened async Weaviate client.")
+            self._last_ok = time.monotonic()
+            return client
+
+    async def _close_client(self, client) -> None:
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning(f"Error closing async Weaviate client: {e}")
+
+    async def _run_scoped(self, fn):
+        client = await self._connect()
+        try:
+            return await fn(client)
+        finally:
+            await self._close_client(client)
+
+    async def run(self, fn, retries: int = 1):
+        """Awaits `fn(client)` under the in-flight cap, reconnecting once on connection loss."""
+        if not self.is_bound():
+            return await self._run_scoped(fn)
+        async with self._slots:
+            for attempt in range(retries + 1):
+                client = await self._get_client()
+                try:
+                    return await fn(client)
+                except CONNECTION_ERRORS as e:
+                    if self._client is client:
+                        self._client = None
+                        await self._close_client(client)
+                    if attempt == retries:
+                        raise
+                    logger.warning(f"Async Weaviate connection error ({e}), reconnecting.")
+
+    async def close(self) -> None:
+        """Closes the persistent client. Must run on the loop passed to `start()`."""
+        client, self._client, self._loop = self._client, None, None
+        if client is not None:
+            await self._close_client(client)
+            logger.info("Async Weaviate client closed.")
+
+
+# Global async manager (Lazy loaded)
+_async_manager = None
+
+
+def get_async_manager() -> AsyncWeaviateManager:
+    global _async_manager
+    if _async_manager is None:
+        _async_manager = AsyncWeaviateManager(
+            max_inflight=int(os.getenv("WEAVIATE_MAX_INFLIGHT", "16")),
+            health_interval=float(os.getenv("WEAVIATE_HEALTH_INTERVAL", "30")),
+        )
+    return _async_manager
+
+
+async def close_async_manager() -> None:
+    if _async_manager is not None:
+        await _async_manager.close()
@@ -1,7 +1,9 @@
 import os
-import re
+import json
 import uuid
 import asyncio
+import logging
+import weakref
 import importlib
 from dotenv import load_dotenv
 
@@ -15,8 +17,9 @@ except RuntimeError:
 from contextlib import asynccontextmanager
 from typing import Optional, List, Dict
 
-from fastapi import FastAPI, HTTPException, WebSocket
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
@@ -29,17 +32,15 @@ root_agent = None
 async def lifespan(app: FastAPI):
     global root_agent
     try:
-        print("Initialize Agent...")
+        logger.info("Initialize Agent...")
         from legal_agent.agent import get_agent
         root_agent = get_agent()
-        print("Agent Initialized.")
+        logger.info("Agent Initialized.")
     except Exception as e:
-        print(f"CRITICAL ERROR IN LIFESPAN: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"CRITICAL ERROR IN LIFESPAN: {e}")
         raise
     yield
-    print("Shutting down...")
+    logger.info("Shutting down...")
 
 # Google ADK imports
 from google.adk.agents import InvocationContext, RunConfig
@@ -50,6 +51,13 @@ from google.genai import types
 
 load_dotenv()
 
+# --- LOGGING ---
+# JSON lines through a background writer thread (LOG_LEVEL, LOG_LEVELS, LOG_FORMAT)
+from legal_agent import logs
+from legal_agent.logs import RequestIdMiddleware, setup_logging, stop_logging
+setup_logging()
+logger = logging.getLogger("server")
+
 # --- PATCH GOOGLE ADK ---
 try:
     targets = [
@@ -71,12 +79,12 @@ try:
                     SessionClass.Config.extra = "ignore"
                     patched = True
                 if patched:
-                    print(f"SUCCESS: Patched {target}.Session to allow extra fields.")
+                    logger.info(f"Patched {target}.Session to allow extra fields.")
                     break
         except ImportError:
             continue
 except Exception as e:
-    print(f"Patching warning: {e}")
+    logger.warning(f"Patching warning: {e}")
 # ------------------------
 
 # --- SESSION SERVICE ---
@@ -87,10 +95,22 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # --- SESSION SERVICE ---
 # Switched to FilePersistence to save chats across restarts
-from legal_agent.persistence import FileSessionService
-
+# SESSION_BACKEND=sqlite keeps them in one indexed SQLite database instead
 session_storage_path = os.path.join(BASE_DIR, "legal_agent", "sessions")
-session_service = FileSessionService(storage_dir=session_storage_path)
+if os.getenv("SESSION_BACKEND", "file").lower() == "sqlite":
+    from legal_agent.sqlite_sessions import SqliteSessionService
+    session_service = SqliteSessionService(
+        os.getenv("SESSION_DB_PATH", os.path.join(session_storage_path, "sessions.db"))
+    )
+else:
+    from legal_agent.persistence import FileSessionService
+    session_service = FileSessionService(storage_dir=session_storage_path)
+
+# --- REQUEST PROFILES ---
+# Folded stacks of profiled chat turns, next to the sessions they belong to
+from legal_agent.profiling import ProfileStore, SamplingProfiler, check_admin_token
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(session_storage_path, "profiles"))
+profile_store = ProfileStore(PROFILE_DIR)
 
 # --- APP LIFESPAN ---
 # --- APP LIFESPAN ---
@@ -100,58 +120,90 @@ runner_instance = None
 async def lifespan(app: FastAPI):
     global runner_instance
     try:
-        print("Initialize Agent Runner...")
+        logger.info("Initialize Agent Runner...")
         # lazy import to avoid circular dep issues if any, ensuring env execution
         from legal_agent.runner import LegalAgentRunner
         
         # Initialize the singleton runner with our session service
         runner_instance = LegalAgentRunner.get_instance(session_service)
-        print("Agent Runner Initialized.")
+        logger.info("Agent Runner Initialized.")
+
+        # Persistent async Weaviate client for retrieve_legal_info on this loop
+        from legal_agent.tools.weaviate_pool import get_async_manager
+        get_async_manager().start()
         
         # --- AUTO-INGESTION ---
-        print("Checking Weaviate status...")
-        try:
-            import weaviate
-            from weaviate.auth import AuthApiKey
-            from legal_agent.ingest import ingest
-            
-            w_url = os.getenv("WEAVIATE_URL")
-            w_key = os.getenv("WEAVIATE_API_KEY")
-            
-            if w_url:
-                client = weaviate.connect_to_weaviate_cloud(
-                    cluster_url=w_url,
-                    auth_credentials=AuthApiKey(w_key) if w_key else None
-                )
-                try:
-                    cols = client.collections.list_all()
-                    if "LegalDocs" not in cols:
-                         print("LegalDocs collection missing. Starting Auto-Ingestion...")
-                         ingest()
-                    else:
-                         # Optional: Check if empty
-                         coll = client.collections.get("LegalDocs")
-                         count = coll.aggregate.over_all(total_count=True).total_count
-                         if count == 0:
-                             print("LegalDocs collection empty. Starting Auto-Ingestion...")
-                             ingest()
-                         else:
-                             print(f"LegalDocs collection exists ({count} docs). Skipping ingestion.")
-                finally:
-                    client.close()
-        except Exception as e:
-            print(f"Auto-ingestion check failed: {e}")
+        # Runs in the background: the server takes requests right away and chat
+        # answers from web search only until /ready reports the index as ready.
+        from legal_agent.ingest import ensure_index
+        from legal_agent.index.status import get_index_status
+
+        from legal_agent.index.lexical import get_lexical_index
+        from legal_agent.index.statute import get_section_index
+
+        def prepare_index():
+            ensure_index(index_status)
+            # Opened here, off the event loop, rather than by the first query that needs them
+            if index_status.state == "ready":
+                get_lexical_index()
+                get_section_index()
+
+        logger.info("Checking retrieval index status in the background...")
+        index_status = get_index_status()
+        app.state.ingestion_task = asyncio.create_task(asyncio.to_thread(prepare_index))
         # ----------------------
+
+        # Deletes sessions and drafts past their retention (SESSION_/DRAFT_RETENTION_DAYS)
+        from legal_agent.janitor import build_janitor
+        app.state.janitor = build_janitor(session_service, OUTPUT_DIR, PROFILE_DIR)
+        app.state.janitor_task = asyncio.create_task(app.state.janitor.run())
+
+        # Components' counters, read at scrape time by /metrics
+        from legal_agent import telemetry
+        from legal_agent.tools.embedding_cache import get_embedding_cache
+        from legal_agent.tools.semantic_cache import get_semantic_cache
+        from legal_agent.tools.weaviate_pool import get_pool
+        telemetry.register_stats("sessions", session_service.stats)
+        telemetry.register_stats("admission", get_admission().stats)
+        telemetry.register_stats("janitor", app.state.janitor.stats)
+        telemetry.register_stats("embedding_cache", lambda: get_embedding_cache().stats())
+        telemetry.register_stats("semantic_cache", lambda: get_semantic_cache().stats())
+        telemetry.register_stats("weaviate_pool", lambda: get_pool().stats())
+        telemetry.register_stats("logging", logs.stats)
     except Exception as e:
-        print(f"CRITICAL ERROR IN LIFESPAN: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"CRITICAL ERROR IN LIFESPAN: {e}")
         raise
     yield
-    print("Shutting down...")
+    logger.info("Shutting down...")
+    ingestion_task = getattr(app.state, "ingestion_task", None)
+    if ingestion_task is not None and not ingestion_task.done():
+        # Stops after the current batch; the half-built index version is discarded
+        index_status.cancel()
+        await asyncio.wait({ingestion_task})
+    janitor_task = getattr(app.state, "janitor_task", None)
+    if janitor_task is not None:
+        janitor_task.cancel()
+        await asyncio.wait({janitor_task})
+        logger.info(f"Janitor: {app.state.janitor.stats()}")
+    # Write-behind sessions still pending in memory
+    await session_service.close()
+    logger.info(f"Session persistence: {session_service.stats()}")
+    logger.info(f"Chat admission: {get_admission().stats()}")
+    from legal_agent.tools.weaviate_pool import close_pool, close_async_manager
+    await close_async_manager()
+    close_pool()
+    from legal_agent.tools.embedding_cache import get_embedding_cache
+    logger.info(f"Embedding cache: {get_embedding_cache().stats()}")
+    get_embedding_cache().close()
+    from legal_agent.tools.semantic_cache import get_semantic_cache
+    logger.info(f"Semantic result cache: {get_semantic_cache().stats()}")
+    stop_logging()
 
 app = FastAPI(title="Legal Agent API", lifespan=lifespan)
 
+# Request id for log correlation (X-Request-ID in and out)
+app.add_middleware(RequestIdMiddleware)
+
 # --- CORS ---
 app.add_middleware(
     CORSMiddleware,
@@ -179,45 +231,153 @@ class ChatResponse(BaseModel):
 class SessionResponse(BaseModel):
     session_id: str
 
+# --- HELPERS ---
+from legal_agent.admission import Overloaded, Ticket, get_admission
+
+# How often a running chat turn checks whether its client is still connected
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+class ClientDisconnected(Exception):
+    pass
+
+async def run_until_disconnected(http_request: Request, coro):
+    """Awaits `coro`, cancelling it if the client goes away first (no point finishing the turn)."""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                await asyncio.wait({task})
+                raise ClientDisconnected()
+    finally:
+        # The handler itself was cancelled (server shutdown)
+        if not task.done():
+            task.cancel()
+
+async def resolve_session_id(session_id: Optional[str], user_id: str) -> str:
+    """The given session if it exists for this user, otherwise a new one."""
+    if session_id:
+        # Validate session exists
+        sess = await session_service.get_session("legal_agent", user_id, session_id)
+        if sess:
+            return session_id
+    return await session_service.create_session("legal_agent", user_id)
+
+async def admit(session_id: Optional[str]) -> Ticket:
+    """
+    Admits a turn before its session is looked up or created, so a shed request
+    leaves no session behind. A new session has no earlier turns to wait for,
+    so its turn is admitted under a key of its own.
+    """
+    return await get_admission().acquire(session_id or uuid.uuid4().hex)
+
+def overloaded_response(e) -> JSONResponse:
+    return JSONResponse(status_code=e.status_code, content={"detail": e.detail},
+                        headers={"Retry-After": str(e.retry_after)})
+
+def require_admin(http_request: Request) -> None:
+    if not check_admin_token(http_request.headers.get("x-admin-token")):
+        raise HTTPException(status_code=403, detail="A valid X-Admin-Token is required (set ADMIN_TOKEN to enable).")
+
+def wants_profile(http_request: Request) -> bool:
+    """X-Profile: 1 or ?profile=1 asks for the turn to be profiled (admins only)."""
+    flag = http_request.headers.get("x-profile") or http_request.query_params.get("profile") or ""
+    if flag.lower() not in ("1", "true", "yes"):
+        return False
+    require_admin(http_request)
+    return True
+
+def with_download_url(message: dict) -> dict:
+    if message.get("filename"):
+        message["url"] = f"/downloads/{message['filename']}"
+    return message
+
 # --- ENDPOINTS ---
 
 @app.get("/")
 async def health():
     return {"status": "ok", "service": "legal_agent"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness of the retrieval index (503 while it is being checked or built)."""
+    from legal_agent.index.status import get_index_status
+
+    status = get_index_status().snapshot()
+    return JSONResponse(status_code=200 if status["state"] == "ready" else 503, content=status)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: span and turn latencies, tool/LLM calls, tokens, cache hit ratios."""
+    from legal_agent.telemetry import render_metrics
+
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+@app.get("/admin/profiles")
+async def list_profiles(http_request: Request, session_id: Optional[str] = None, limit: int = 50):
+    """Recent request profiles, newest first (X-Admin-Token required)."""
+    require_admin(http_request)
+    profiles = await asyncio.to_thread(profile_store.list, limit, session_id)
+    for profile in profiles:
+        profile["url"] = f"/admin/profiles/{profile['name']}"
+    return {"profiles": profiles}
+
+@app.get("/admin/profiles/{name}")
+async def download_profile(name: str, http_request: Request):
+    """A profile in folded-stack format, for flamegraph.pl, speedscope or inferno."""
+    require_admin(http_request)
+    path = profile_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=name)
+
 @app.post("/session", response_model=SessionResponse)
 async def create_session_endpoint():
     session_id = await session_service.create_session("legal_agent", "default_user")
     return SessionResponse(session_id=session_id)
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request, response: Response):
+    # Sampled while the turn runs (not while it waits for admission), saved even if it fails
+    profiler = SamplingProfiler() if wants_profile(http_request) else None
+    session_id = request.session_id
     try:
-        # 1. Get Session ID
-        session_id = request.session_id
-        if not session_id:
-             session_id = await session_service.create_session("legal_agent", request.user_id)
-        else:
-             # Validate session exists
-             sess = await session_service.get_session("legal_agent", request.user_id, session_id)
-             if not sess:
-                  session_id = await session_service.create_session("legal_agent", request.user_id)
-
-        # 2. Execute Runner
-        # The runner abstraction handles context, user content creation, and the event loop
-        final_text = await runner_instance.run_chat(session_id, request.message, user_id=request.user_id)
+        # The runner abstraction handles context, user content creation, and the event loop.
+        # Turns on one session run in order, and only CHAT_MAX_CONCURRENT at once overall.
+        async def admitted_turn():
+            nonlocal session_id
+            ticket = await admit(request.session_id)
+            try:
+                # 1. Get Session ID (once admitted, so a shed request creates no session)
+                session_id = await resolve_session_id(request.session_id, request.user_id)
+
+                # 2. Execute Runner
+                if profiler is None:
+                    return await runner_instance.run_chat(session_id, request.message, user_id=request.user_id)
+                with profiler:
+                    return await runner_instance.run_chat(session_id, request.message, user_id=request.user_id)
+            finally:
+                ticket.release()
+
+        try:
+            final_text = await run_until_disconnected(http_request, admitted_turn())
+        finally:
+            if profiler is not None and profiler.samples:
+                try:
+                    profile = await asyncio.to_thread(profile_store.save, session_id, logs.request_id.get(), profiler)
+                    logger.info(f"Profiled turn for session {session_id}: {profile} "
+                                f"({profiler.samples} samples over {profiler.duration:.2f}s)")
+                    response.headers["X-Profile"] = profile
+                except OSError as e:
+                    logger.error(f"Could not save the profile of session {session_id}: {e}")
 
         # 3. Extract File (Logic retained from original)
-        filename = None
-        # Explicit path check
-        path_match = re.search(r'created at:\s*(.*?\.docx)', final_text, re.IGNORECASE)
-        if path_match:
-            filename = os.path.basename(path_match.group(1).strip())
-        # Regex Draft Check
-        if not filename:
-            draft_match = re.search(r'Draft_[a-zA-Z0-9_-]+\.(docx|pdf)', final_text)
-            if draft_match:
-                 filename = draft_match.group(0)
+        from legal_agent.runner import find_generated_file
+        filename = find_generated_file(final_text)
 
         return ChatResponse(
             response=final_text,
@@ -225,11 +385,117 @@ async def chat_endpoint(request: ChatRequest):
             session_id=session_id
         )
 
+    except Overloaded as e:
+        return overloaded_response(e)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="The agent took too long to answer, please try again.")
+    except ClientDisconnected:
+        logger.info(f"Client disconnected, cancelled turn for session {session_id}")
+        # Nobody is listening; 499 (client closed request) only shows up in the access log
+        return JSONResponse(status_code=499, content={"detail": "Client disconnected."})
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Chat turn failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Server-Sent Events for one turn: a "session" event with the session id, then
+    "text" (partial answer), "tool_start", "tool_end" and "file" events as the
+    agent produces them, and "done" with the full response (or "error").
+    """
+    # Admitted before the response starts, so a shed turn still gets a 429/503 status,
+    # and before the session is resolved, so it creates no session either
+    try:
+        ticket = await admit(request.session_id)
+    except Overloaded as e:
+        return overloaded_response(e)
+    try:
+        session_id = await resolve_session_id(request.session_id, request.user_id)
+    except BaseException:
+        ticket.release()
+        raise
+
+    async def events():
+        yield f"event: session\ndata: {json.dumps({'session_id': session_id})}\n\n"
+        try:
+            # Starlette cancels this generator when the client disconnects, which cancels the turn
+            async for message in runner_instance.stream_chat(session_id, request.message, user_id=request.user_id):
+                message = with_download_url(message)
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+        except asyncio.TimeoutError:
+            detail = "The agent took too long to answer, please try again."
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': detail})}\n\n"
+        except Exception as e:
+            logger.exception(f"Streamed turn failed for session {session_id}: {e}")
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+        finally:
+            ticket.release()
+
+    stream = events()
+    # A stream dropped before it ever started never reaches its finally block
+    weakref.finalize(stream, ticket.release)
+    # No proxy buffering, or the first token would wait for the whole turn again
+    return StreamingResponse(stream, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket):
+    """
+    One connection, many turns: each {"message", "session_id"?, "user_id"?} sent
+    by the client is answered with the same messages as /chat/stream (as JSON
+    with a "type" field). Closing the socket cancels the turn in progress.
+    """
+    await websocket.accept()
+    inbox: asyncio.Queue = asyncio.Queue()
+
+    async def receive():
+        # Reads ahead, so a disconnect is noticed while a turn is still running
+        try:
+            while True:
+                await inbox.put(await websocket.receive_json())
+        except (WebSocketDisconnect, RuntimeError, ValueError):
+            await inbox.put(None)
+
+    async def run_turn(data: dict):
+        user_id = data.get("user_id") or "default_user"
+        try:
+            ticket = await admit(data.get("session_id"))
+        except Overloaded as e:
+            await websocket.send_json({"type": "error", "detail": e.detail, "status": e.status_code,
+                                       "retry_after": e.retry_after})
+            return
+        try:
+            session_id = await resolve_session_id(data.get("session_id"), user_id)
+            await websocket.send_json({"type": "session", "session_id": session_id})
+            async for message in runner_instance.stream_chat(session_id, data.get("message", ""), user_id=user_id):
+                await websocket.send_json(with_download_url(message))
+        except asyncio.TimeoutError:
+            await websocket.send_json({"type": "error", "detail": "The agent took too long to answer, please try again."})
+        except Exception as e:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+        finally:
+            ticket.release()
+
+    reader = asyncio.create_task(receive())
+    try:
+        while True:
+            data = await inbox.get()
+            if data is None:
+                break
+            turn = asyncio.create_task(run_turn(data))
+            # The reader only finishes when the socket closes
+            await asyncio.wait({turn, reader}, return_when=asyncio.FIRST_COMPLETED)
+            if not turn.done():
+                logger.info("WebSocket client disconnected, cancelling turn.")
+                turn.cancel()
+                await asyncio.wait({turn})
+                break
+            if turn.exception() is not None:
+                break  # Could not send: the socket is gone
+    finally:
+        reader.cancel()
+
 if __name__ == "__main__":
     import uvicorn
     # Use app object directly to avoid import confusion
@@ -6,6 +6,7 @@ import json
 # --- CONFIGURATION ---
 API_BASE_URL = "http://localhost:8002"
 CHAT_ENDPOINT = f"{API_BASE_URL}/chat"
+STREAM_ENDPOINT = f"{API_BASE_URL}/chat/stream"
 DOWNLOAD_ENDPOINT = f"{API_BASE_URL}/downloads"
 
 st.set_page_config(
@@ -48,6 +49,25 @@ for message in st.session_state.messages:
                 key=message["msg_id"] # Unique key for the button
             )
 
+# --- STREAMING ---
+TOOL_LABELS = {
+    "retrieve_legal_info": "Searching the Acts",
+    "search_web": "Searching the web",
+    "generate_legal_document": "Drafting the document",
+}
+
+def iter_sse(response):
+    """(event, data) pairs from a Server-Sent Events response."""
+    event, data = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+        elif not line and event:
+            yield event, json.loads("\n".join(data))
+            event, data = None, []
+
 # --- CHAT INPUT & LOGIC ---
 if prompt := st.chat_input("Ask a legal question or request a draft..."):
     # 1. Add User Message to History
@@ -66,12 +86,25 @@ if prompt := st.chat_input("Ask a legal question or request a draft..."):
         }
 
         try:
-            response = requests.post(CHAT_ENDPOINT, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            
-            agent_text = data.get("response", "No response text.")
-            filename = data.get("filename")
+            # Streamed: text shows up as it is generated, with the tool in use meanwhile
+            agent_text, status, filename = "", "", None
+            with requests.post(STREAM_ENDPOINT, json=payload, stream=True) as response:
+                response.raise_for_status()
+                for event, data in iter_sse(response):
+                    if event == "text":
+                        agent_text += data["text"]
+                        status = ""
+                    elif event == "tool_start":
+                        status = f"_{TOOL_LABELS.get(data['name'], data['name'])}..._"
+                    elif event == "file":
+                        filename = data["filename"]
+                    elif event == "done":
+                        agent_text = data.get("response") or agent_text or "No response text."
+                        filename = data.get("filename") or filename
+                        status = ""
+                    elif event == "error":
+                        raise RuntimeError(data.get("detail", "Chat request failed"))
+                    message_placeholder.markdown("\n\n".join(p for p in (agent_text, status) if p) or "Thinking...")
             
             # Update chat text
             message_placeholder.markdown(agent_text)